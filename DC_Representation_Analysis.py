@@ -6,13 +6,18 @@
 # In[424]:
 
 
-import nbconvert
 import pandas as pd 
-import seaborn as sb
-import matplotlib as plt
-import matplotlib.pyplot as pyplt
-import PIL as plw
-import scipy.stats as stats
+from dc_loader import loadCharacters
+from dc_images import showImage
+from dc_rules import applyRules
+from dc_clean import validateCategories
+from dc_names import NameIndex, identityTotals
+from dc_concentration import topShare, concentration
+from dc_stratify import getCube, rollUp, allStrata
+from dc_ranking import RankIndex
+from dc_chisquare import getChiSquare, chiSquareGrid
+from dc_memo import CachedAnalysis
+from dc_timeseries import yearlyTotals, windowTests
 
 
 # # Does DC Comics Represent Gender Equally?
@@ -20,9 +25,7 @@ import scipy.stats as stats
 # In[425]:
 
 
-from PIL import Image
-harlz = Image.open("harley.jpg");
-display(harlz)
+showImage("harley.jpg")
 
 
 # *Harley Quinn, in her new animated series on HBO Max. In the last eight years, Harley has appeared in over 600 DC comics issues. As we're about to see, that's a promising trend compared to where DC was in 2014.* 
@@ -44,7 +47,7 @@ display(harlz)
 # In[426]:
 
 
-dc = pd.read_csv("dc-comics.csv")
+dc = loadCharacters("dc-comics.csv") # only the columns used below, with compact types; cached after the first run
 dc.head(3)
 
 
@@ -74,7 +77,7 @@ dc.head(11)
 
 # #### How I Researched Trans Characters:
 # 
-# The dataset was scraped from DC's fandom wiki pages. I found [DC's page dedicated to transgender characters] (https://dc.fandom.com/wiki/Category:Transgender_Characters) and ran a query by using python's ```str.contains()``` function and its ```join()``` function to match inclusively:
+# The dataset was scraped from DC's fandom wiki pages. I found [DC's page dedicated to transgender characters] (https://dc.fandom.com/wiki/Category:Transgender_Characters) and ran a query to match inclusively, i.e. any name containing one of the listed names (```NameIndex.contains```, which with ```caseSensitive = True``` works like ```str.contains('|'.join(...))```, but takes the names literally, so punctuation in a name is never read as regex syntax):
 
 # In[428]:
 
@@ -82,7 +85,8 @@ dc.head(11)
 trans_characters = ["Alysia Yeoh", "Andrea Martinez", "Aruna Shende", "Bia", "Burke Day",  "Daystar","Dinah Lance",
                    "Echo", "Kate Godwin", "Masquerade", "Nia Nal","Pado Swakatoon", "Shvaughn Erin",
                    "Stephen Forrest Lee", "Susan Su", "Taylor Barzelay", "Victoria October", "Wanda Mann"]
-dc[dc.name.str.contains('|'.join(trans_characters))]
+names = NameIndex(dc.name)
+dc[names.contains(trans_characters, wholeWord = False, caseSensitive = True)]
 
 
 # Bianca was a false match (she is not in the transgender wiki; her name just starts with "Bia"), same with Doctor Echo. I researched the remainder. From their wiki pages, I found strong evidence Kate, Daystar, Aruna, and Andrea are all transgender women. 
@@ -90,8 +94,7 @@ dc[dc.name.str.contains('|'.join(trans_characters))]
 # In[429]:
 
 
-aruna_img = Image.open("aruna_shende.jpg");
-display(aruna_img)
+showImage("aruna_shende.jpg")
 
 
 # *Aruna Shende*
@@ -99,8 +102,7 @@ display(aruna_img)
 # In[430]:
 
 
-lee_img = Image.open("stephen_forrest_lee.jpg")
-display(lee_img)
+showImage("stephen_forrest_lee.jpg")
 
 
 # *Stephen Forrest Lee*
@@ -119,7 +121,7 @@ pd.DataFrame(dictGenderChanges)
 
 # #### First transformation: rename variable and recode trans characters
 # 
-# Using ```loc()``` I located the noted characters and changed their *GENDER* values.
+# The changes are kept in a table, gender_recodes.csv (one row per character: name, column, new value, and whether they're transgender), and ```applyRules``` applies them all at once. It also reports how many rows each rule matched, so a typo'd or ambiguous name shows up immediately.
 
 # In[432]:
 
@@ -127,17 +129,15 @@ pd.DataFrame(dictGenderChanges)
 
 
 dc = dc.rename(columns = {"SEX" : "GENDER"})
-dc.loc[dc.name.str.contains("Shende"), "GENDER"] = "Female Characters"
+dc, recodeReport = applyRules(dc)
+dc = validateCategories(dc) # stops here if the scrape or a recode introduced a label the analysis doesn't expect
+recodeReport
 
-dc.loc[dc.name.str.contains("Andrea Martinez"), "GENDER"] = "Female Characters"
 
-dc.loc[dc.name.str.contains("Daystar"), "GENDER"] = "Female Characters"
-dc.loc[dc.name.str.contains("Daystar"), "Transgender"] = "Yes"
+# In[ ]:
 
 
-dc.loc[dc.name.str.contains("Stephen Forrest"), "GENDER"] = "Nonbinary Characters"
-dc[(dc.name.str.contains('|'.join(trans_characters))) & (dc.name != "Bianca Reyes (New Earth)") &
-  (dc.name != "Doctor Echo (New Earth)")]
+dc[names.lookup(trans_characters)] # exact match on the name without its "(New Earth)" suffix, so no Bianca or Doctor Echo
 
 
 # In[433]:
@@ -224,7 +224,9 @@ dc.APPEARANCES.sum()
 # 
 # Data from the US Census indicates approximately 50.7% of the US population is female, 48.9% male, and 0.4% nonbinary. The total appearances by all characters from this dataset is 153188. So, for instance, the *expected appearances* for women is equal to *0.507 times 153188*.
 # 
-# **Contingency tables** are produced to compare expected representation to observed representation. Contingency tables are produced by creating a dictionary with relevant values and converting it to a pandas df. In addition I will use a **chi-squared goodness of fit test** to evaluate whether differences between *expected* appearances by gender and *actual* apppearances by gender are large enough to not have occurred by random chance. **The null hypothesis is that the distribution of appearances by gender is representative of the distribution of gender in the U.S.** Chi-squared compares that expected count to the actual count, and tests whether the difference is small enough to be attributed to random chance. Chi-squared GOF can be imported from scipy.stats (function documentation: https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.chisquare.html?highlight=chisquare#scipy.stats.chisquare)
+# **Contingency tables** are produced to compare expected representation to observed representation. Contingency tables are produced by ```getChiSquare```, which takes a table of observed appearances (one row per group, one column per gender) and builds the expected counts and differences for every row at once. In addition I will use a **chi-squared goodness of fit test** to evaluate whether differences between *expected* appearances by gender and *actual* apppearances by gender are large enough to not have occurred by random chance. **The null hypothesis is that the distribution of appearances by gender is representative of the distribution of gender in the U.S.** Chi-squared compares that expected count to the actual count, and tests whether the difference is small enough to be attributed to random chance. Chi-squared GOF can be imported from scipy.stats (function documentation: https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.chisquare.html?highlight=chisquare#scipy.stats.chisquare); ```getChiSquare``` computes the same statistic for many groups at once.
+# 
+# To run the whole analysis outside of Jupyter (e.g. on a newer scrape), use ```python dc_report.py dc-comics.csv --out results/```, which writes these tables to disk.
 # 
 # 
 # To sum, the chi-squared test will tell us whether the difference is large enough that it couldn't have occurred randomly, while the contigency tables provide visualization of how large the difference is, exactly.
@@ -234,13 +236,10 @@ dc.APPEARANCES.sum()
 # In[441]:
 
 
-dictCounts = {'Gender': ['Female','Male','Nonbinary'],
-                'Expected Sum of Appearances': [.507*153188, .489*153188, .004*153188],
-                'Actual Sum of Appearances':   [42280, 110900, 8],
-             }
-count_compare = pd.DataFrame(dictCounts, columns=['Gender', 'Expected Sum of Appearances', 'Actual Sum of Appearances'])
-count_compare['Difference'] =  count_compare['Actual Sum of Appearances'] - count_compare['Expected Sum of Appearances']
-count_compare['% Difference'] = count_compare['Difference'] / count_compare['Expected Sum of Appearances']
+cube = getCube(dc, ["ALIGN", "ALIVE"]) # for scrapes too big for memory, dc_stream.streamCube builds the same cube chunk by chunk
+ranking = RankIndex(dc) # each GENDER x ALIVE x ALIGN group's characters, sorted by appearances, for the top-5 lists below
+contingency = getChiSquare(allStrata(cube))
+count_compare = contingency.loc["All"].reset_index()
 count_compare
 
 
@@ -249,10 +248,37 @@ count_compare
 # In[442]:
 
 
-stats.chisquare(f_obs = [42280, 110900, 8], f_exp = [.507*153188, .489*153188, .004*153188])
+count_compare[['Chi-square', 'p-value']].iloc[0]
 
 
 # The p value of 0 means we reject the null; there is strong statistical evidence that these proportions are not representative. The difference in count of appearances versus expected counts based on demographics is too great to be attributed to random chance.
+# 
+# A p-value of exactly 0 is a rounding artifact of the chi-squared approximation, which is also less trustworthy when an expected count is small (as nonbinary counts are in the smaller groups). As a check, I simulated 100,000 universes that *do* match the census proportions for every group and counted how often their chi-squared statistic was at least as large as ours. (Simulations like this one are slow, so ```CachedAnalysis``` keeps their results on disk, keyed on the dataset, the recodes, the baseline and the groups; rerunning the notebook with nothing changed just reads them back.)
+
+# In[ ]:
+
+
+analysis = CachedAnalysis("dc-comics.csv", strata = ["ALIGN", "ALIVE"])
+analysis.multinomial(replicates = 100000)
+
+
+# Appearances are very top-heavy, so a few star characters can move the % Difference a lot. Resampling characters within each group gives 95% confidence intervals for every % Difference:
+
+# In[ ]:
+
+
+intervals = analysis.bootstrap(replicates = 10000)
+# one interval per row of the contingency table, "Unknown ALIGN" groups included
+assert intervals.index.equals(contingency.index)
+intervals
+
+
+# The census breakdown isn't the only reasonable baseline. baselines.csv holds alternatives (add a row to try another), and every group is tested against all of them at once:
+
+# In[ ]:
+
+
+chiSquareGrid(allStrata(cube))["p-value"]
 
 # ### Plots: Expected vs Actual Appearances by Gender
 
@@ -263,6 +289,8 @@ count_compare = count_compare.rename(columns = {'Expected Sum of Appearances' :
 countShort = count_compare[['Gender','Expected','Actual']]
 countLong = pd.melt(countShort, id_vars = 'Gender', var_name = 'Type', value_name = 'Appearances' )
 
+import seaborn as sb # only imported once there's something to plot
+
 sb.catplot(
     data = countLong, x = 'Type', y= 'Appearances', 
     col = "Gender", height=3, kind = 'bar'
@@ -283,47 +311,30 @@ sb.barplot(
 # In[445]:
 
 
-def getcontingencyTable(m,f,nb,total_appearances):
-    dict = {'Gender': ['Female','Male','Nonbinary'],
-                'Expected Sum of Appearances': [.507*total_appearances, .489*total_appearances, .004*total_appearances],
-                'Actual Sum of Appearances':   [m, f, nb],
-             }
-    df = pd.DataFrame(dict, columns=['Gender', 'Expected Sum of Appearances', 'Actual Sum of Appearances'])
-    df = df.round(decimals = 3)
-    df['Difference'] =  df['Actual Sum of Appearances'] - df['Expected Sum of Appearances']
-    df['% Difference'] = df['Difference'] / df['Expected Sum of Appearances']
-    return(df)
+def getcontingencyTable(stratum):
+    return(contingency.loc[stratum])
 
 
 # ## Representation Stratified by Alignment
 
-# It is of interest to see how representation looks in evil characters compared to good. Do the discrepancies disappear, diminish, reverse, increase, or stay the same in each group? I created two new dataframes, one with all "bad characters" and another with all "good characters".
+# It is of interest to see how representation looks in evil characters compared to good. Do the discrepancies disappear, diminish, reverse, increase, or stay the same in each group? Rather than making a new dataframe for each group, I aggregate appearances once into a gender x alignment x living status "cube" and roll it up for every stratum.
 
 # In[446]:
 
 
-dc_good = dc[dc.ALIGN == "Good Characters"]
-dc_evil = dc[dc.ALIGN == "Bad Characters"]
-
-
-# In[447]:
-
-
-totalapp_good = dc_good.APPEARANCES.sum()
-totalapp_bad = dc_evil.APPEARANCES.sum()
+byAlign = rollUp(cube, ["ALIGN"])
 
 
 # In[448]:
 
 
-dc_evil.head(10)
+dc[dc.ALIGN == "Bad Characters"].head(10)
 
 
 # In[449]:
 
 
-jean = Image.open("eclipso.jpg")
-display(jean)
+showImage("eclipso.jpg")
 
 
 # *Jean Loring aka Eclipso had the most appearances (168) among female villains at the time this dataset was made. She is canonically dead, and trailed behind nine male villains, including Lex Luthor, who led the pack with 677 appearances.*
@@ -337,33 +348,20 @@ display(jean)
 # In[450]:
 
 
-dc_good.groupby(dc_good.GENDER).APPEARANCES.sum()
+byAlign.loc["Good Characters"]
 
 
 # #### Contingency Table and chi-squared test
 
-# In[451]:
+# The chi-squared statistic and p-value are the last two columns of each table.
 
+# In[451]:
 
-gooddict = {'Gender': ['Female','Male','Nonbinary'],
-                'Expected Sum of Appearances': [.507*totalapp_good, .489*totalapp_good, .004*totalapp_good],
-                'Actual Sum of Appearances':   [30009, 69822, 0],
-             }
-goodDF = pd.DataFrame(gooddict, columns=['Gender', 'Expected Sum of Appearances', 'Actual Sum of Appearances'])
-goodDF = goodDF.round(decimals = 3)
-goodDF['Difference'] =  goodDF['Actual Sum of Appearances'] - goodDF['Expected Sum of Appearances']
-goodDF['% Difference'] = goodDF['Difference'] / goodDF['Expected Sum of Appearances']
 
+goodDF = getcontingencyTable("Good Characters")
 goodDF
 
 
-# In[452]:
-
-
-stats.chisquare(f_obs = [30009, 69822,0], f_exp = [50614.317, 48817.359, 399.324])
-stats.chisquare(f_obs = [3000, 3000,3000], f_exp = [4000, 2000,3000])
-
-
 # ### Evil:
 
 # #### Observed:
@@ -371,7 +369,7 @@ stats.chisquare(f_obs = [3000, 3000,3000], f_exp = [4000, 2000,3000])
 # In[453]:
 
 
-dc_evil.groupby(dc_evil.GENDER).APPEARANCES.sum()
+byAlign.loc["Bad Characters"]
 
 
 # #### Contingency table and chi-squared test:
@@ -379,39 +377,24 @@ dc_evil.groupby(dc_evil.GENDER).APPEARANCES.sum()
 # In[454]:
 
 
-evildict = {'Gender': ['Female','Male','Nonbinary'],
-                'Expected Sum of Appearances': [.507*totalapp_bad, .489*totalapp_bad, .004*totalapp_bad],
-                'Actual Sum of Appearances':   [5546, 22773, 8],
-             }
-evilDF = pd.DataFrame(evildict, columns=['Gender', 'Expected Sum of Appearances', 'Actual Sum of Appearances'])
-evilDF = evilDF.round(decimals = 3)
-evilDF['Difference'] =  evilDF['Actual Sum of Appearances'] - evilDF['Expected Sum of Appearances']
-evilDF['% Difference'] = evilDF['Difference'] / evilDF['Expected Sum of Appearances']
-
+evilDF = getcontingencyTable("Bad Characters")
 evilDF
 
 
-# In[455]:
-
-
-stats.chisquare(f_obs = [5546, 22773, 8], f_exp = [14361.789, 13851.903, 113.308])
-
-
 # ## Representation Stratified by Alive vs Dead
 # 
-# How do disparities look in living characters and dead characters? I created two more new dataframes to tackle this.
+# How do disparities look in living characters and dead characters? The same cube answers this, rolled up by living status instead.
 
 # In[456]:
 
 
-dcAlive = dc[dc.ALIVE == "Living Characters"]
-dcDead = dc[dc.ALIVE == "Deceased Characters"]
+byAlive = rollUp(cube, ["ALIVE"])
 
 
 # In[457]:
 
 
-dcDead.head(1)
+dc[dc.ALIVE == "Deceased Characters"].head(1)
 
 
 # I was getting tired of calculating observed values, so I made a function that would do it quickly for me:
@@ -419,15 +402,14 @@ dcDead.head(1)
 # In[458]:
 
 
-def getSum(x):
-    return(x.groupby(x.GENDER).APPEARANCES.sum())
+def getSum(**where):
+    return(rollUp(cube, where = where).loc["All"])
 
 
 # In[459]:
 
 
-alan = Image.open("alan_scott.jpg")
-display(alan)
+showImage("alan_scott.jpg")
 
 
 # *Alan Scott, the first Green Lantern, died in the New Earth universe after a whopping 969 appearances.*
@@ -439,19 +421,13 @@ display(alan)
 # In[460]:
 
 
-getSum(dcAlive)
+getSum(ALIVE = "Living Characters")
 
 
 # In[461]:
 
 
-getcontingencyTable(35088,84497,0,35088+84497)
-
-
-# In[462]:
-
-
-stats.chisquare(f_obs = [35088,84497,0], f_exp = [60629.595, 58477.065, 478.340])
+getcontingencyTable("Living Characters")
 
 
 # ### Dead Characters:
@@ -459,19 +435,13 @@ stats.chisquare(f_obs = [35088,84497,0], f_exp = [60629.595, 58477.065, 478.340]
 # In[463]:
 
 
-getSum(dcDead)
+getSum(ALIVE = "Deceased Characters")
 
 
 # In[464]:
 
 
-getcontingencyTable(7184,26397,8,7184+26397+8)
-
-
-# In[465]:
-
-
-stats.chisquare(f_obs = [7184,26397,8], f_exp = [17029.623, 16425.021, 134.356])
+getcontingencyTable("Deceased Characters")
 
 
 # ## Representation Stratified by Combining Living/Dead with Good/Evil
@@ -479,13 +449,11 @@ stats.chisquare(f_obs = [7184,26397,8], f_exp = [17029.623, 16425.021, 134.356])
 # In[466]:
 
 
-dc_goodAlive = dc_good[dc_good.ALIVE == "Living Characters"]
-dc_goodDead = dc_good[dc_good.ALIVE == "Deceased Characters"]
-dc_evilAlive = dc_evil[dc_evil.ALIVE == "Living Characters"]
-dc_evilDead = dc_evil[dc_evil.ALIVE == "Deceased Characters"]
+byAlignAlive = rollUp(cube, ["ALIGN", "ALIVE"])
+byAlignAlive
 
 
-# Finally, I double stratified living status with good/evil status, creating four new dataframes.
+# Finally, I double stratified living status with good/evil status, giving four more groups from the same cube.
 # 
 # Discrepancies hold at every double stratification, men are always overrepresented while women and nonbinary people are underrepresented. 
 # 
@@ -500,19 +468,13 @@ dc_evilDead = dc_evil[dc_evil.ALIVE == "Deceased Characters"]
 # In[467]:
 
 
-getSum(dc_goodAlive)
+getSum(ALIGN = "Good Characters", ALIVE = "Living Characters")
 
 
 # In[468]:
 
 
-getcontingencyTable(25366, 54687,0, 25366+54687)
-
-
-# In[469]:
-
-
-stats.chisquare(f_obs = [25366, 54687, 0], f_exp = [40586.871, 39145.917, 320.212])
+getcontingencyTable("Good Characters / Living Characters")
 
 
 # ### Deceased Heroes
@@ -520,19 +482,13 @@ stats.chisquare(f_obs = [25366, 54687, 0], f_exp = [40586.871, 39145.917, 320.21
 # In[470]:
 
 
-getSum(dc_goodDead)
+getSum(ALIGN = "Good Characters", ALIVE = "Deceased Characters")
 
 
 # In[471]:
 
 
-getcontingencyTable(4643, 15129, 0, 4643+15129)
-
-
-# In[472]:
-
-
-stats.chisquare(f_obs = [4643, 15129, 0], f_exp = [10024.404, 9668.508, 79.088])
+getcontingencyTable("Good Characters / Deceased Characters")
 
 
 # ### Living Villains
@@ -540,19 +496,13 @@ stats.chisquare(f_obs = [4643, 15129, 0], f_exp = [10024.404, 9668.508, 79.088])
 # In[473]:
 
 
-getSum(dc_evilAlive)
+getSum(ALIGN = "Bad Characters", ALIVE = "Living Characters")
 
 
 # In[474]:
 
 
-getcontingencyTable(3835, 15769, 0, 3835 + 15769)
-
-
-# In[475]:
-
-
-stats.chisquare(f_obs = [3835, 15769, 0], f_exp = [9939.228, 9586.356, 78.416] )
+getcontingencyTable("Bad Characters / Living Characters")
 
 
 # ### Deceased Villains
@@ -560,19 +510,13 @@ stats.chisquare(f_obs = [3835, 15769, 0], f_exp = [9939.228, 9586.356, 78.416] )
 # In[476]:
 
 
-getSum(dc_evilDead)
+getSum(ALIGN = "Bad Characters", ALIVE = "Deceased Characters")
 
 
 # In[477]:
 
 
-getcontingencyTable(1703, 7004,8, 1703+7004+8)
-
-
-# In[478]:
-
-
-stats.chisquare(f_obs = [1703, 7004, 8], f_exp = [4418.505, 4261.635, 34.860])
+getcontingencyTable("Bad Characters / Deceased Characters")
 
 
 # # Conclusion
@@ -599,15 +543,14 @@ stats.chisquare(f_obs = [1703, 7004, 8], f_exp = [4418.505, 4261.635, 34.860])
 dc.shape
 
 
-# The data is already sorted by appearances, which makes grabbing a percentile very easy. The top 1% of characters by appearance (rounding down), for instance, is simply the first 67 observations. What percent of the total appearances do their appearances make up? 
+# The top 1% of characters by appearance (rounding down) is 67 characters. What percent of the total appearances do their appearances make up? The source file happens to be sorted by appearances, but ```topShare``` picks out the top characters itself, so the answer doesn't depend on row order (which any recode or merge could change).
 
 # ##### One percenters:
 
 # In[480]:
 
 
-dcOnePercenters = dc.head(67) # the data is already sorted by appearances
-dcOnePercenters.APPEARANCES.sum() / dc.APPEARANCES.sum()
+topShare(dc.APPEARANCES, .01)
 
 
 # ##### Ten percenters:
@@ -615,8 +558,15 @@ dcOnePercenters.APPEARANCES.sum() / dc.APPEARANCES.sum()
 # In[481]:
 
 
-dcTenPercenters = dc.head(675)
-dcTenPercenters.APPEARANCES.sum() / dc.APPEARANCES.sum()
+topShare(dc.APPEARANCES, .10)
+
+
+# The same numbers for each gender, along with the Gini coefficient (0 if every character appeared equally often, 1 if one character had every appearance):
+
+# In[ ]:
+
+
+concentration(dc, "GENDER")
 
 
 # So, appearance data *is* very top heavy. The top 1% of characters by appearances make up 28% of the total appearances. The top 10% make up 69%. Thus, it makes a lot of mathematical sense to think that if the composition of the top 1 or 10% changes, we'll see a big swing in overall appearances by gender.
@@ -630,7 +580,8 @@ dcTenPercenters.APPEARANCES.sum() / dc.APPEARANCES.sum()
 # In[482]:
 
 
-dc[(dc.GENDER == "Female Characters") & (dc.ALIVE == "Living Characters")].head(5)
+topLivingWomen = ranking.top(5, GENDER = "Female Characters", ALIVE = "Living Characters")
+topLivingWomen
 
 
 # Approximate average year of first appearance:
@@ -638,14 +589,13 @@ dc[(dc.GENDER == "Female Characters") & (dc.ALIVE == "Living Characters")].head(
 # In[483]:
 
 
-(1969 + 1967 + 1938 + 1976 + 1941)/5
+topLivingWomen.YEAR.mean()
 
 
 # In[484]:
 
 
-batgirl = Image.open("batgirl2.jpg");
-display(batgirl)
+showImage("batgirl2.jpg")
 
 
 # *Barbara Gordon*
@@ -657,24 +607,57 @@ display(batgirl)
 # In[485]:
 
 
-dc[(dc.GENDER == "Female Characters") & (dc.ALIVE == "Living Characters") & (dc.ALIGN == "Bad Characters")].head(5)
+topLivingVillainesses = ranking.top(5, GENDER = "Female Characters", ALIVE = "Living Characters", ALIGN = "Bad Characters")
+topLivingVillainesses
 
 
 # In[486]:
 
 
-(1999 + 1983 + 1989 + 1988 + 1972)/5
+topLivingVillainesses.YEAR.mean()
 
 
 # In[487]:
 
 
-harlz2 = Image.open("harley2.jpeg")
-display(harlz2)
+showImage("harley2.jpeg")
 
 
 # Harley Quinn tops our list of living villains... and that's pre-2015! And she only joined in 1999! She's joined by a mix of villains who're generally much newer than the top 5 heroes (on average, our top five living villainesses joined in 1986).
 # 
 # If I were making fun conjectures in 2014, I might have thought Harley was on her way to doing something extraordinary, but then again I might have thought her rise was unsustainable -- I checked and there were a few female villains with more appearances than her... all of whom are now canonically dead. To give you an idea of where she was at the time, this dataset was published before Margot Robbie was announced to play Harley in Suicide Squad (2016 version). She was at a big pivot point, which *is* perhaps cause for hope, because we've now seen which way that pivot went (more on this in conclusion).
 
-# Post-2014, Harley has appeared another 660 times (50 more times in new earth, and 610 times in Prime Earth, DC's new universe).  
+# ### Has Representation Changed Over Time?
+# 
+# The year of each character's first appearance tells us something about when DC was (or wasn't) creating well-represented characters. Summing appearances by the decade characters debuted in:
+
+# In[ ]:
+
+
+yearlyTotals(dc, binWidth = 10)
+
+
+# And the chi-squared test for every 10-year window of debut years (rolling) and for all characters who debuted up to each year (expanding):
+
+# In[ ]:
+
+
+windowTests(dc, windows = [None, 10])
+
+
+# Post-2014, Harley has appeared another 660 times (50 more times in new earth, and 610 times in Prime Earth, DC's new universe).
+
+# On a newer scrape that includes Prime Earth, the same character shows up once per universe. ```identityTotals``` adds a character's appearances up across all of their universes (the base name, without the "(New Earth)" part, is the character's identity):
+
+# In[ ]:
+
+
+identityTotals(dc).sort_values("APPEARANCES", ascending = False).head(5)
+
+
+# Representation can also be split by universe:
+
+# In[ ]:
+
+
+rollUp(getCube(dc, ["UNIVERSE"]), ["UNIVERSE"])
@@ -0,0 +1,102 @@
+"""Stage-by-stage benchmark of the analysis on synthetic data.
+
+    python benchmarks/bench_stages.py --sizes 6000 100000 1000000 10000000
+
+For each size a synthetic CSV is generated (see synthetic.py), then each
+stage is timed separately and its peak traced memory recorded: load
+(cold, then cached), recode, null/genderless filter, stratification,
+contingency/chi-square, top-k concentration and plotting.  Results are printed and written as JSON.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import writeCharacters  # noqa: E402
+
+from dc_chisquare import getChiSquare  # noqa: E402
+from dc_clean import DROPPED_ROWS, dropUnusable, recodeGender  # noqa: E402
+from dc_concentration import concentration, topShare  # noqa: E402
+from dc_loader import loadCsv  # noqa: E402
+from dc_stratify import allStrata, getCube  # noqa: E402
+
+STAGES = ["load", "recode", "filter", "stratify", "chisquare", "concentration", "plot"]
+
+
+def timeStage(fn, *args, memory=True):
+    """Run ``fn(*args)``; returns (result, wall seconds, peak traced MB).
+
+    tracemalloc slows Python-heavy stages down several times over, so the
+    timed run is untraced and peak memory comes from a second, traced run.
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    wall = time.perf_counter() - start
+    peak = 0
+    if memory:
+        tracemalloc.start()
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, wall, peak / 2**20
+
+
+def _plot(contingency, outDir):
+    from dc_figures import renderFigures
+    return renderFigures(contingency.loc[["All"]], outDir, workers=1, force=True)
+
+
+def runSize(n, workDir, plot=True, memory=True):
+    path = writeCharacters(os.path.join(workDir, "synthetic-%d.csv" % n), n)
+    cacheDir = tempfile.mkdtemp(dir=workDir)
+    row = {"rows": n}
+
+    def record(stage, fn, *args):
+        result, wall, peak = timeStage(fn, *args, memory=memory)
+        row[stage + "_s"], row[stage + "_peak_mb"] = round(wall, 4), round(peak, 1)
+        return result
+
+    # "load" always starts from an empty cache (parse + write the cache);
+    # "load_cached" is the memory-mapped path, whose pages tracemalloc can't see
+    dc = record("load", lambda: loadCsv(path, tempfile.mkdtemp(dir=workDir)))
+    loadCsv(path, cacheDir)
+    record("load_cached", lambda: loadCsv(path, cacheDir))
+    dc = record("recode", lambda: recodeGender(dc.drop(list(DROPPED_ROWS))))
+    dc = record("filter", dropUnusable, dc)
+    observed = record("stratify", lambda: allStrata(getCube(dc, ["ALIGN", "ALIVE"])))
+    contingency = record("chisquare", getChiSquare, observed)
+    record("concentration", lambda: (topShare(dc.APPEARANCES, .01), concentration(dc, "GENDER")))
+    if plot:
+        record("plot", _plot, contingency, os.path.join(workDir, "figures-%d" % n))
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each analysis stage on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[6_000, 100_000, 1_000_000])
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--no-plot", action="store_true", help="skip the plotting stage")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--workdir", default=None, help="where to keep generated data (default: temp dir)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workDir = args.workdir or tmp
+        os.makedirs(workDir, exist_ok=True)
+        rows = []
+        for n in args.sizes:
+            rows.append(runSize(n, workDir, plot=not args.no_plot, memory=not args.no_memory))
+            print(json.dumps(rows[-1]))
+    with open(args.out, "w") as f:
+        json.dump(rows, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
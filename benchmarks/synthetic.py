@@ -0,0 +1,55 @@
+"""Synthetic character tables shaped like dc-comics.csv, for benchmarking.
+
+Appearances are heavy-tailed like the real scrape (a few characters with
+thousands of appearances, most with a handful), and the label columns use
+the same values and rough proportions, so every stage of the analysis does
+realistic work at any size.
+"""
+
+import numpy as np
+import pandas as pd
+
+UNIVERSES = ["New Earth", "Prime Earth", "Earth-Two", "Earth-One"]
+
+LABELS = {
+    "ID": (["Secret Identity", "Public Identity", "Identity Unknown", None], [.45, .35, .05, .15]),
+    "ALIGN": (["Good Characters", "Bad Characters", "Neutral Characters", "Reformed Criminals", None],
+              [.39, .41, .13, .001, .069]),
+    "EYE": (["Blue Eyes", "Brown Eyes", "Green Eyes", "Black Eyes", None], [.16, .13, .06, .06, .59]),
+    "HAIR": (["Black Hair", "Brown Hair", "Blond Hair", "Red Hair", "Bald", None], [.29, .16, .11, .04, .02, .38]),
+    "SEX": (["Male Characters", "Female Characters", "Genderless Characters", "Transgender Characters", None],
+            [.7277, .2536, .0029, .0001, .0157]),
+    "ALIVE": (["Living Characters", "Deceased Characters", None], [.7266, .2734, .0]),
+}
+
+# characters the recode rules look for, so the recode stage has matches
+RECODED = ["Aruna Shende", "Andrea Martinez", "Daystar", "Stephen Forrest Lee"]
+
+
+def makeCharacters(n, seed=0):
+    """A DataFrame of ``n`` synthetic characters with the dc-comics.csv columns."""
+    rng = np.random.default_rng(seed)
+    universes = rng.choice(UNIVERSES, n)
+    names = pd.Series(np.arange(n)).map("Character %d".__mod__) + " (" + universes + ")"
+    names.iloc[:len(RECODED)] = [name + " (New Earth)" for name in RECODED][:n]
+
+    frame = {"page_id": np.arange(n), "name": names, "urlslug": "\\/wiki\\/" + names.str.replace(" ", "_")}
+    for column, (values, weights) in LABELS.items():
+        weights = np.asarray(weights) / np.sum(weights)
+        frame[column] = rng.choice(np.array(values, dtype=object), n, p=weights)
+    frame["GSM"] = np.where(rng.random(n) < .01, "Homosexual Characters", None)
+
+    # Pareto tail: roughly 1% of characters hold a quarter of all appearances
+    appearances = np.floor(rng.pareto(1.1, n) * 4 + 1)
+    appearances[rng.random(n) < .05] = np.nan
+    frame["APPEARANCES"] = appearances
+    years = rng.integers(1935, 2014, n).astype(float)
+    years[rng.random(n) < .01] = np.nan
+    frame["FIRST APPEARANCE"] = pd.Series(years).map(lambda y: "" if np.isnan(y) else "%d, May" % y)
+    frame["YEAR"] = years
+    return pd.DataFrame(frame).sort_values("APPEARANCES", ascending=False, ignore_index=True)
+
+
+def writeCharacters(path, n, seed=0):
+    makeCharacters(n, seed).to_csv(path, index=False)
+    return path
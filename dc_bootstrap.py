@@ -0,0 +1,99 @@
+"""Bootstrap confidence intervals for % Difference.
+
+Appearances are extremely top-heavy (the top 1% of characters hold about 28%
+of them), so a handful of characters can swing a stratum's % Difference a
+long way.  ``bootstrapDifference`` resamples characters with replacement
+inside each stratum and recomputes every gender's % Difference, giving
+percentile and BCa intervals for every row of the contingency table.
+
+Each batch of resamples is one (batch x characters) index array, and the
+per-gender sums for the whole batch come from a single weighted bincount.
+Batches from every stratum share one process pool and are seeded the same
+way as the Monte Carlo tests, so results depend only on ``seed``.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from dc_chisquare import BASELINE, shortLabel
+from dc_montecarlo import runJobs, seedBatches
+from dc_stratify import GENDERS, stratumCharacters
+
+
+def pctDifference(sums, baseline):
+    """% Difference per gender from (... x G) appearance sums."""
+    expected = sums.sum(axis=-1, keepdims=True) * baseline
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums / expected - 1
+
+
+def _bootstrapBatch(strata, stratum, size, seedSeq, baseline):
+    genders, appearances = strata[stratum]
+    rng = np.random.default_rng(seedSeq)
+    n, nGenders = len(genders), len(baseline)
+    picks = rng.integers(0, n, size=(size, n))
+    cells = genders[picks] + nGenders * np.arange(size)[:, None]
+    sums = np.bincount(cells.ravel(), weights=appearances[picks].ravel(),
+                       minlength=size * nGenders).reshape(size, nGenders)
+    return pctDifference(sums, baseline)
+
+
+def _jackknife(genders, appearances, baseline):
+    # leave-one-out % Difference for every character at once
+    nGenders = len(baseline)
+    sums = np.bincount(genders, weights=appearances, minlength=nGenders)
+    leaveOut = sums[None, :] - appearances[:, None] * (genders[:, None] == np.arange(nGenders))
+    return pctDifference(leaveOut, baseline)
+
+
+def _bcaInterval(estimate, boots, jack, alpha):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z0 = ndtri((boots < estimate).mean(axis=0))
+        spread = jack.mean(axis=0) - jack
+        a = (spread ** 3).sum(axis=0) / (6 * ((spread ** 2).sum(axis=0)) ** 1.5)
+        bounds = []
+        for z in (ndtri(alpha / 2), ndtri(1 - alpha / 2)):
+            level = ndtr(z0 + (z0 + z) / (1 - a * (z0 + z)))
+            bounds.append(np.array([np.nanquantile(boots[:, g], level[g]) if np.isfinite(level[g]) else np.nan
+                                    for g in range(boots.shape[1])]))
+    # a gender whose resamples never vary (e.g. no characters at all) has a
+    # zero-width interval, which the formulas above can't express
+    constant = np.nanmin(boots, axis=0) == np.nanmax(boots, axis=0)
+    return [np.where(constant, estimate, bound) for bound in bounds]
+
+
+def bootstrapDifference(dc, levels=((), ("ALIGN",), ("ALIVE",), ("ALIGN", "ALIVE")),
+                        baseline=BASELINE, replicates=10_000, batchSize=None, alpha=.05,
+                        workers=None, seed=0):
+    """Percentile and BCa intervals for % Difference in every stratum.
+
+    Strata are labelled like ``allStrata``, and the result is indexed by
+    (Stratum, Gender) like ``getChiSquare``.  ``batchSize`` defaults to about
+    five million resampled characters per batch.
+    """
+    baseline = pd.Series(baseline).reindex(GENDERS).to_numpy(dtype=float)
+    strata, jobs, owner = [], [], []
+    for label, genders, appearances in stratumCharacters(dc, levels):
+        size = batchSize or max(1, 5_000_000 // max(len(genders), 1))
+        for batch, seq in seedBatches(replicates, size, seed):
+            jobs.append((len(strata), batch, seq, baseline))
+            owner.append(len(strata))
+        strata.append((label, genders, appearances))
+
+    # the pool gets every stratum's characters once; jobs just name theirs
+    batches = runJobs(_bootstrapBatch, jobs, workers, [(g, v) for _, g, v in strata])
+    owner = np.array(owner)
+
+    rows = []
+    for i, (label, genders, appearances) in enumerate(strata):
+        boots = np.vstack([batches[j] for j in np.flatnonzero(owner == i)])
+        estimate = pctDifference(np.bincount(genders, weights=appearances, minlength=len(GENDERS)), baseline)
+        with np.errstate(invalid="ignore"):
+            low, high = np.nanquantile(boots, [alpha / 2, 1 - alpha / 2], axis=0)
+        bcaLow, bcaHigh = _bcaInterval(estimate, boots, _jackknife(genders, appearances, baseline), alpha)
+        for g, gender in enumerate(GENDERS):
+            rows.append((label, shortLabel(gender), estimate[g], low[g], high[g], bcaLow[g], bcaHigh[g]))
+
+    return pd.DataFrame(rows, columns=["Stratum", "Gender", "% Difference", "Percentile Low",
+                                       "Percentile High", "BCa Low", "BCa High"]).set_index(["Stratum", "Gender"])
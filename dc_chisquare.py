@@ -0,0 +1,113 @@
+"""Vectorized chi-square goodness of fit over many strata at once.
+
+Takes an (S strata x G genders) table of observed appearances and a baseline
+proportion per gender, and builds the contingency table (expected, actual,
+difference, % difference) plus the chi-square statistic and p-value for
+every stratum in one NumPy pass.
+
+``chiSquareGrid`` does the same against a whole table of baselines at once
+(see baselines.csv), for checking how much the conclusions depend on which
+population breakdown is used.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.special import chdtrc
+
+from dc_stratify import GENDERS
+from dc_trace import stage
+
+# share of the US population that is female, male, nonbinary (census data)
+BASELINE = pd.Series([.507, .489, .004], index=GENDERS)
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.csv")
+
+
+def shortLabel(gender):
+    return gender.replace(" Characters", "")
+
+
+def getExpected(observed, baseline=BASELINE):
+    """Expected counts: each stratum's total appearances split by the baseline."""
+    observed = np.asarray(observed, dtype=float)
+    baseline = np.asarray(baseline, dtype=float)
+    return observed.sum(axis=-1, keepdims=True) * baseline
+
+
+def chiSquare(observed, expected):
+    """Row-wise chi-square statistic and p-value for (S x G) arrays."""
+    observed = np.asarray(observed, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = ((observed - expected) ** 2 / expected).sum(axis=-1)
+    # chi2 survival function; scipy.special is much cheaper to import than scipy.stats
+    pvalue = chdtrc(observed.shape[-1] - 1, statistic)
+    return statistic, pvalue
+
+
+def getChiSquare(observed, baseline=BASELINE):
+    """Contingency table and chi-square test for every stratum in ``observed``.
+
+    ``observed`` is a (strata x gender) DataFrame such as the ones returned by
+    ``rollUp`` / ``allStrata``.  The result is one tidy DataFrame indexed by
+    (stratum, Gender) with the expected and actual sums, the difference, the
+    % difference, and the stratum's chi-square statistic and p-value.
+    """
+    if not isinstance(observed, pd.DataFrame):
+        observed = pd.DataFrame(np.atleast_2d(observed), columns=GENDERS)
+    with stage("chisquare", rowsIn=len(observed)) as s:
+        table = _contingency(observed, pd.Series(baseline).reindex(observed.columns))
+        s.rowsOut = len(table)
+    return table
+
+
+def _contingency(observed, baseline):
+
+    actual = observed.to_numpy(dtype=float)
+    expected = getExpected(actual, baseline)
+    statistic, pvalue = chiSquare(actual, expected)
+    difference = actual - expected
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pctDifference = difference / expected
+
+    S, G = actual.shape
+    genders = [shortLabel(g) for g in observed.columns]
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(observed.index.to_numpy(), G), np.tile(genders, S)],
+        names=[observed.index.name or "Stratum", "Gender"],
+    )
+    return pd.DataFrame({
+        'Expected Sum of Appearances': expected.ravel(),
+        'Actual Sum of Appearances': actual.ravel(),
+        'Difference': difference.ravel(),
+        '% Difference': pctDifference.ravel(),
+        'Chi-square': np.repeat(statistic, G),
+        'p-value': np.repeat(pvalue, G),
+    }, index=index)
+
+
+def loadBaselines(path=BASELINES_PATH):
+    """Read a (baselines x gender) proportion table, one named baseline per row."""
+    baselines = pd.read_csv(path, index_col="baseline")
+    return baselines.reindex(columns=GENDERS, fill_value=0.0).astype(float)
+
+
+def chiSquareGrid(observed, baselines=None):
+    """Chi-square statistic and p-value for every stratum against every baseline.
+
+    ``observed`` is (S strata x G genders) and ``baselines`` is (B x G); the
+    two are broadcast to an (S x B x G) expected array in one operation.
+    Returns an S x B grid with ("Chi-square", baseline) and ("p-value",
+    baseline) columns, so ``grid["p-value"]`` is the S x B table of p-values.
+    """
+    baselines = loadBaselines() if baselines is None else baselines
+    actual = observed.to_numpy(dtype=float)
+    proportions = baselines.reindex(columns=observed.columns, fill_value=0.0).to_numpy(dtype=float)
+    expected = actual.sum(axis=1)[:, None, None] * proportions[None, :, :]
+    statistic, pvalue = chiSquare(actual[:, None, :], expected)
+    return pd.concat({
+        'Chi-square': pd.DataFrame(statistic, index=observed.index, columns=baselines.index),
+        'p-value': pd.DataFrame(pvalue, index=observed.index, columns=baselines.index),
+    }, axis=1)
@@ -0,0 +1,64 @@
+"""Gender recodes and filtering shared by the in-memory and streaming paths.
+
+The recodes themselves live in gender_recodes.csv (see dc_rules); the
+"Modifications to the Source" section of DC_Representation_Analysis explains
+why each character is recoded.
+"""
+
+import pandas as pd
+
+from dc_loader import CATEGORIES
+from dc_rules import applyRules, loadRules
+from dc_trace import stage
+
+# row 10 of the 2014 scrape is dropped before any analysis
+DROPPED_ROWS = (10,)
+
+
+def recodeGender(dc, rules=None):
+    """Rename SEX to GENDER and apply the recode rules table.
+
+    ``rules`` is a rules DataFrame, a path to one, None for the default
+    gender_recodes.csv, or False to skip recoding.
+    """
+    dc = dc.rename(columns={"SEX": "GENDER"})
+    if rules is False:
+        return dc
+    if isinstance(rules, str):
+        rules = loadRules(rules)
+    dc, _ = applyRules(dc, rules)
+    return dc
+
+
+def validateCategories(dc, categories=CATEGORIES):
+    """Check label columns only hold known labels, and make them categoricals.
+
+    Raises ValueError naming any unexpected labels (a new label in a scrape,
+    or a recode rule with a typo'd value) instead of letting them fall out
+    of the analysis unnoticed.
+    """
+    for column, known in categories.items():
+        if column not in dc.columns:
+            continue
+        unexpected = pd.Index(dc[column].dropna().unique()).difference(known)
+        if len(unexpected):
+            raise ValueError("unexpected %s values: %s" % (column, ", ".join(map(str, unexpected))))
+        dc[column] = pd.Categorical(dc[column], categories=known)
+    return dc
+
+
+def dropUnusable(dc):
+    """Drop characters with no gender value or a "Genderless" one."""
+    return dc[dc.GENDER.notnull() & (dc.GENDER != "Genderless Characters")]
+
+
+def cleanFrame(dc, dropRows=DROPPED_ROWS, rules=None):
+    """The full cleaning step: drop bad rows, recode, then drop unusable genders."""
+    with stage("recode", rowsIn=len(dc)) as s:
+        dc = recodeGender(dc.drop([row for row in dropRows if row in dc.index]), rules)
+        dc = validateCategories(dc)
+        s.rowsOut = len(dc)
+    with stage("filter", rowsIn=len(dc)) as s:
+        dc = dropUnusable(dc)
+        s.rowsOut = len(dc)
+    return dc
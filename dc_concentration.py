@@ -0,0 +1,105 @@
+"""How concentrated appearances are: top-k characters, top-p% shares, Lorenz curve, Gini.
+
+None of this assumes the frame is sorted by APPEARANCES; ``dc.head(67)`` only
+gave the top 1% because the 2014 CSV happened to be sorted, which stops being
+true after any recode, merge or re-scrape.  Single top-k queries use partial
+selection (``np.argpartition``); everything else comes from one sort plus a
+cumulative sum, done for every group at the same time.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dc_trace import stage
+
+
+def _values(appearances):
+    # characters with no recorded appearances count as zero
+    return np.nan_to_num(np.asarray(appearances, dtype=float))
+
+
+def topK(appearances, k):
+    """Positions of the k largest values, largest first, without a full sort."""
+    values = _values(appearances)
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    top = np.argpartition(-values, k - 1)[:k]
+    return top[np.argsort(-values[top], kind="stable")]
+
+
+def topShare(appearances, p):
+    """Share of all appearances held by the top ``p`` (e.g. .01) of characters.
+
+    The number of characters is rounded down, so the top 1% of 6,7xx
+    characters is the top 67.
+    """
+    values = _values(appearances)
+    k = int(np.floor(p * len(values)))
+    if k <= 0 or values.sum() == 0:
+        return 0.0
+    return np.partition(values, len(values) - k)[len(values) - k:].sum() / values.sum()
+
+
+def lorenz(appearances):
+    """Lorenz curve: cumulative share of characters vs cumulative share of appearances."""
+    values = np.sort(_values(appearances))
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    population = np.linspace(0, 1, len(values) + 1)
+    return population, cumulative / cumulative[-1]
+
+
+def gini(appearances):
+    """Gini coefficient of appearances (0 = everyone equal, 1 = one character has them all)."""
+    values = np.sort(_values(appearances))
+    n = len(values)
+    if n == 0 or values.sum() == 0:
+        return 0.0
+    return 2 * np.sum(np.arange(1, n + 1) * values) / (n * values.sum()) - (n + 1) / n
+
+
+def concentration(dc, by=None, shares=(.01, .10)):
+    """Top-p% shares and Gini for every group of ``dc`` in a single sort.
+
+    ``by`` is a column or list of columns (e.g. "GENDER" or ["GENDER",
+    "ALIGN"]); with no ``by`` the whole frame is one "All" group.
+    """
+    with stage("concentration", rowsIn=len(dc)) as s:
+        result = _concentration(dc, by, shares)
+        s.rowsOut = len(result)
+    return result
+
+
+def _concentration(dc, by, shares):
+    values = _values(dc.APPEARANCES)
+    if by is None:
+        codes = np.zeros(len(values), dtype=np.intp)
+        labels = pd.Index(["All"])
+    else:
+        grouped = dc.groupby(by, sort=True, observed=True)
+        codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.intp)
+        labels = grouped.size().index
+        # rows with a missing key aren't in any group; leave them out
+        values, codes = values[codes >= 0], codes[codes >= 0]
+
+    # one sort: by group, then by appearances descending within the group
+    order = np.lexsort((-values, codes))
+    values, codes = values[order], codes[order]
+    sizes = np.bincount(codes, minlength=len(labels))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    totals = np.bincount(codes, weights=values, minlength=len(labels))
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+
+    result = pd.DataFrame({"Characters": sizes, "Appearances": totals}, index=labels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p in shares:
+            k = np.floor(p * sizes).astype(np.intp)
+            topSums = cumulative[starts + k] - cumulative[starts]
+            result["Top %g%% Share" % (p * 100)] = np.where(totals > 0, topSums / totals, 0.0)
+
+        # Gini from descending ranks: ascending rank = size - descending rank + 1
+        rank = np.arange(len(values)) - starts[codes] + 1
+        weighted = np.bincount(codes, weights=(sizes[codes] - rank + 1) * values, minlength=len(labels))
+        giniValues = 2 * weighted / (sizes * totals) - (sizes + 1) / sizes
+    result["Gini"] = np.where(totals > 0, giniValues, 0.0)
+    return result
@@ -0,0 +1,85 @@
+"""Side-by-side analysis of several wiki scrapes (DC, Marvel, ...).
+
+Each publisher's scrape has the same overall shape as dc-comics.csv but its
+own quirks: column names ("Year" vs "YEAR"), label spellings, rows to drop
+and character recodes.  A dataset is registered once with those quirks,
+normalized into the shared categories (``dc_loader.CATEGORIES``), and every
+registered dataset is analyzed concurrently into one comparative table.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dc_chisquare import BASELINE, getChiSquare
+from dc_clean import cleanFrame, DROPPED_ROWS
+from dc_concentration import concentration
+from dc_loader import loadCsv
+from dc_stratify import allStrata, getCube, strataLevels
+
+DATASETS = {}
+
+
+def registerDataset(name, path, columns=None, labels=None, dropRows=(), rules=False):
+    """Register a scrape under ``name``.
+
+    ``columns`` renames source columns to the dc-comics.csv names (e.g.
+    ``{"Year": "YEAR"}``).  ``labels`` maps, per column, source labels to
+    the shared ones (e.g. ``{"SEX": {"Genderfluid Characters": "Nonbinary
+    Characters"}}``).  ``rules`` is the recode rules table to apply (a path
+    or DataFrame), or False for none.
+    """
+    DATASETS[name] = {"path": path, "columns": columns or {}, "labels": labels or {},
+                      "dropRows": tuple(dropRows), "rules": rules}
+
+
+registerDataset("DC", "dc-comics.csv", dropRows=DROPPED_ROWS, rules=None)
+
+
+def relabel(dc, labels=None):
+    """Map source labels to the shared ones, column by column."""
+    for column, mapping in (labels or {}).items():
+        dc[column] = dc[column].replace(mapping)
+    return dc
+
+
+def loadDataset(name):
+    """Load, normalize and clean one registered dataset."""
+    return _load(DATASETS[name])
+
+
+def _load(spec):
+    dc = relabel(loadCsv(spec["path"]).rename(columns=spec["columns"]), spec["labels"])
+    # cleanFrame casts GENDER/ALIGN/ALIVE to the shared categories in
+    # dc_loader.CATEGORIES, and fails on any label the mapping missed
+    return cleanFrame(dc, spec["dropRows"], spec["rules"])
+
+
+def _analyze(spec, strata, baseline):
+    dc = _load(spec)
+    cube = getCube(dc, strata)
+    # the same levels as dc_report and CachedAnalysis, so the tables line up
+    return getChiSquare(allStrata(cube, strataLevels(strata)), baseline), concentration(dc, "GENDER")
+
+
+def analyzeDatasets(names=None, strata=("ALIGN", "ALIVE"), baseline=BASELINE, workers=None):
+    """Analyze registered datasets in parallel; returns comparative tables.
+
+    The result has "contingency" (indexed by Dataset, Stratum, Gender) and
+    "concentration" (indexed by Dataset, GENDER) tables.
+    """
+    names = list(DATASETS) if names is None else list(names)
+    strata = list(strata)
+    # workers get the specs themselves: under spawn/forkserver a worker's
+    # DATASETS only holds what's registered at import time
+    specs = [DATASETS[name] for name in names]
+    if workers == 1 or len(names) == 1:
+        results = [_analyze(spec, strata, baseline) for spec in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_analyze, specs, [strata] * len(names), [baseline] * len(names)))
+    contingency, concentrations = zip(*results)
+    return {
+        "contingency": pd.concat(dict(zip(names, contingency)), names=["Dataset"]),
+        "concentration": pd.concat(dict(zip(names, concentrations)), names=["Dataset"]),
+    }
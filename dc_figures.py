@@ -0,0 +1,110 @@
+"""Parallel, cached rendering of the Expected vs Actual figures.
+
+For every stratum in a contingency table (see ``getChiSquare``) this draws
+the Expected vs Actual catplot across genders, plus one enlarged barplot per
+gender like the notebook's nonbinary plot.  Figures are drawn with the
+non-interactive Agg backend in a process pool, and a figure is skipped when
+the data behind it hashes the same as last time it was drawn.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dc_trace import getTracer
+
+MANIFEST = "figures.json"
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(text)).strip("_")
+
+
+def _longFormat(table):
+    # same reshaping the notebook does for its overall plot
+    short = table.reset_index()[['Gender', 'Expected Sum of Appearances', 'Actual Sum of Appearances']]
+    short = short.rename(columns={'Expected Sum of Appearances': 'Expected', 'Actual Sum of Appearances': 'Actual'})
+    return pd.melt(short, id_vars='Gender', var_name='Type', value_name='Appearances')
+
+
+def figureJobs(contingency):
+    """(file name, kind, title, long-format data) for every figure to draw."""
+    jobs = []
+    for stratum in contingency.index.get_level_values(0).unique():
+        data = _longFormat(contingency.loc[stratum])
+        jobs.append((_slug(stratum) + ".png", "catplot", stratum, data))
+        for gender, genderData in data.groupby("Gender", sort=False):
+            jobs.append(("%s_%s.png" % (_slug(stratum), _slug(gender)), "barplot",
+                         "%s: %s" % (stratum, gender), genderData))
+    return jobs
+
+
+def dataHash(kind, title, data):
+    digest = hashlib.sha256(("%s\n%s\n" % (kind, title)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _render(path, kind, title, data):
+    start, cpuStart = time.perf_counter(), time.process_time()
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as pyplt
+    import seaborn as sb
+
+    if kind == "catplot":
+        grid = sb.catplot(data=data, x='Type', y='Appearances', col="Gender", height=3, kind='bar')
+        grid.figure.suptitle(title, y=1.05)
+        figure = grid.figure
+    else:
+        figure, ax = pyplt.subplots(figsize=(4, 3))
+        sb.barplot(data=data, x='Type', y='Appearances', ax=ax)
+        ax.set_title(title)
+    figure.savefig(path, bbox_inches="tight")
+    pyplt.close(figure)
+    return path, time.perf_counter() - start, time.process_time() - cpuStart, os.getpid()
+
+
+def renderFigures(contingency, outDir="figures", workers=None, force=False):
+    """Draw every figure for ``contingency`` into ``outDir``; returns the paths drawn.
+
+    Figures whose data hash matches the manifest from the previous run (and
+    whose file still exists) are left alone unless ``force`` is set.
+    """
+    os.makedirs(outDir, exist_ok=True)
+    manifestPath = os.path.join(outDir, MANIFEST)
+    try:
+        with open(manifestPath) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    todo = []
+    for name, kind, title, data in figureJobs(contingency):
+        path = os.path.join(outDir, name)
+        key = dataHash(kind, title, data)
+        if not force and manifest.get(name) == key and os.path.exists(path):
+            continue
+        manifest[name] = key
+        todo.append((path, kind, title, data))
+
+    if workers == 1 or len(todo) <= 1:
+        drawn = [_render(*job) for job in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            drawn = list(pool.map(_render, *zip(*todo)))
+
+    # figures are timed in the workers, so they're recorded after the fact
+    tracer = getTracer()
+    if tracer is not None:
+        for (path, wall, cpu, pid), job in zip(drawn, todo):
+            tracer.add("figure", wall, cpu, rowsIn=len(job[3]), figure=os.path.basename(path), worker=pid)
+
+    with open(manifestPath, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return [path for path, *_ in drawn]
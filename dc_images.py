@@ -0,0 +1,53 @@
+"""Small, cached thumbnails for the character images shown in the report.
+
+The report used to ``display`` full-resolution JPEGs, which is most of why the
+notebook is several MB and slow to render.  ``showImage`` instead embeds a
+pre-downscaled thumbnail, kept in a cache keyed on the source image's content
+hash and the thumbnail size.  JPEGs are decoded in PIL's draft mode, which
+scales down while decoding instead of decoding the full image first.
+
+Nothing is loaded unless there is somewhere to show it: outside a notebook
+(cron, batch workers, plain ``python``) ``showImage`` returns straight away,
+without importing PIL or IPython.
+"""
+
+import os
+import sys
+
+from dc_loader import CACHE_DIR, atomicWrite, fileHash
+
+THUMBNAIL_SIZE = (640, 640)
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+
+
+def hasDisplay():
+    """True when running under a notebook kernel that can show images."""
+    if "IPython" not in sys.modules:
+        return False
+    from IPython import get_ipython
+    shell = get_ipython()
+    return shell is not None and "IPKernelApp" in getattr(shell, "config", {})
+
+
+def thumbnail(path, size=THUMBNAIL_SIZE, cacheDir=THUMBNAIL_DIR):
+    """Path to a cached thumbnail of ``path`` no larger than ``size``."""
+    os.makedirs(cacheDir, exist_ok=True)
+    key = "%s-%dx%d.jpg" % (fileHash(path)[:16], size[0], size[1])
+    cached = os.path.join(cacheDir, key)
+    if not os.path.exists(cached):
+        from PIL import Image
+        with Image.open(path) as img:
+            img.draft("RGB", size)  # only does anything for JPEGs
+            img = img.convert("RGB")
+            img.thumbnail(size)
+            with atomicWrite(cached) as temp:
+                img.save(temp, "JPEG", quality=85, optimize=True)
+    return cached
+
+
+def showImage(path, size=THUMBNAIL_SIZE):
+    """Display a thumbnail of ``path`` in the notebook; no-op when headless."""
+    if not hasDisplay():
+        return None
+    from IPython.display import Image, display
+    display(Image(filename=thumbnail(path, size)))
@@ -0,0 +1,106 @@
+"""Incremental upkeep of the cube and chi-square results as the wiki changes.
+
+A daily wiki refresh touches well under 1% of characters, so instead of
+reloading the CSV and rebuilding everything, ``RepresentationState`` keeps the
+per-character columns the analysis needs, the GENDER x strata cube and the
+contingency/chi-square table, persisted between runs.  ``applyDelta`` takes a
+feed of changes, subtracts the changed characters' old contributions from the
+cube, adds the new ones, and recomputes only the strata whose cells moved.
+
+A delta is a DataFrame with a ``name`` column plus any of:
+
+- ``APPEARANCES``: appearances to *add* (e.g. Harley Quinn's +660).
+- any attribute column (GENDER, ALIGN, ALIVE, YEAR, ...): the new value;
+  missing values leave the attribute unchanged.
+
+Names not already in the state are added as new characters, with
+``APPEARANCES`` as their starting count.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dc_chisquare import BASELINE, getChiSquare
+from dc_stratify import allStrata, getCube, mergeCubes, rollUp, sourceColumns, stratumLabel
+
+LEVELS = ((), ("ALIGN",), ("ALIVE",), ("ALIGN", "ALIVE"))
+
+
+class RepresentationState:
+    """Per-character data, cube and test results that can be updated in place."""
+
+    def __init__(self, dc, strata=("ALIGN", "ALIVE"), levels=LEVELS, baseline=BASELINE):
+        if dc.name.duplicated().any():
+            raise ValueError("character names must be unique to apply deltas by name")
+        self.strata = list(strata)
+        self.levels = [tuple(by) for by in levels]
+        self.baseline = baseline
+        # names become the index, so UNIVERSE is derived from that
+        columns = ["GENDER", "APPEARANCES"] + [c for c in sourceColumns(self.strata) if c != "name"]
+        self.characters = dc.set_index("name")[list(dict.fromkeys(columns))].copy()
+        self.cube = getCube(self.characters, self.strata)
+        self.results = getChiSquare(allStrata(self.cube, self.levels), self.baseline)
+
+    def save(self, path):
+        pd.to_pickle(self, path)
+
+    @staticmethod
+    def load(path):
+        return pd.read_pickle(path)
+
+    def _updatedRows(self, delta):
+        delta = delta.set_index("name")
+        if delta.index.duplicated().any():
+            delta = delta.groupby(level=0).agg(
+                {c: ("sum" if c == "APPEARANCES" else "last") for c in delta.columns})
+        known = delta.index.isin(self.characters.index)
+
+        old = self.characters.loc[delta.index[known]]
+        new = old.copy()
+        for column in delta.columns:
+            if column == "APPEARANCES":
+                increment = delta.APPEARANCES[known]
+                new["APPEARANCES"] = np.where(increment.notnull(),
+                                              new.APPEARANCES.fillna(0) + increment.fillna(0),
+                                              new.APPEARANCES)
+            elif column in new.columns:
+                change = delta.loc[known, column]
+                new[column] = change.where(change.notnull(), new[column])
+
+        added = delta[~known].reindex(columns=self.characters.columns)
+        return old, pd.concat([new, added])
+
+    def applyDelta(self, delta):
+        """Apply a delta feed; returns the labels of the strata that were retested."""
+        old, new = self._updatedRows(delta)
+        if old.empty and new.empty:
+            return []
+
+        oldCube, newCube = getCube(old, self.strata), getCube(new, self.strata)
+        self.cube = mergeCubes([self.cube, -oldCube, newCube])
+        self.cube = self.cube[self.cube.CHARACTERS != 0]
+        self.characters = pd.concat([self.characters.drop(old.index), new])
+
+        # only strata containing a cell that changed need a new test
+        touched = mergeCubes([oldCube, newCube]).index.to_frame(index=False)
+        retested = []
+        for by in self.levels:
+            where = {level: touched[level].unique() for level in by}
+            table = rollUp(self.cube, by, where=where)
+            # matched on labels, since MultiIndex.isin misses keys with a missing value
+            changed = touched[list(by)].drop_duplicates().itertuples(index=False, name=None)
+            labels = [stratumLabel(key, by) for key in changed] if by else ["All"]
+            table.index = pd.Index([stratumLabel(key, by) for key in table.index], name="Stratum")
+            table = table[table.index.isin(labels)]
+            retested.extend(table.index)
+            self._replace(getChiSquare(table, self.baseline), labels)
+        return retested
+
+    def _replace(self, results, touched=()):
+        # a touched stratum missing from results lost its last character
+        strata = results.index.get_level_values("Stratum").unique()
+        current = self.results.index.get_level_values("Stratum")
+        gone = pd.Index(touched).difference(strata, sort=False)
+        order = current.unique().difference(gone, sort=False).append(strata.difference(current, sort=False))
+        kept = self.results[~current.isin(strata) & ~current.isin(gone)]
+        self.results = pd.concat([kept, results]).loc[order]
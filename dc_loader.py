@@ -0,0 +1,162 @@
+"""Cached loading of the wiki-scrape CSV.
+
+The first load of a CSV parses it with pandas and writes a Feather (Arrow IPC)
+copy next to it in a cache directory, keyed on the CSV's content hash.  Later
+loads memory-map that copy instead of re-parsing, and the cache is rebuilt
+automatically whenever the CSV's contents change.
+
+pyarrow is optional: without it ``loadCsv`` just falls back to ``pd.read_csv``.
+
+``loadCharacters`` adds a declared schema on top: only the columns the
+analysis uses are read, label columns are categoricals, APPEARANCES is a
+nullable int32 and YEAR a nullable int16.  That is several times smaller
+than object-string columns and makes the groupbys much faster.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+import pandas as pd
+
+from dc_trace import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow isn't a hard requirement
+    pa = None
+
+CACHE_DIR = ".dc_cache"
+
+# columns the analysis needs, and the dtype each is read as
+SCHEMA = {
+    # "string" rather than "object": Feather hands object columns of text
+    # back as pandas' default string dtype, so a cached load would differ
+    "name": "string",
+    "SEX": "category",
+    "ALIGN": "category",
+    "ALIVE": "category",
+    "APPEARANCES": "Int32",
+    "YEAR": "Int16",
+}
+
+# the labels each category column may hold once recoding is done; anything
+# else means the scrape (or a recode rule) introduced a label we don't handle
+CATEGORIES = {
+    "GENDER": ["Female Characters", "Male Characters", "Nonbinary Characters",
+               "Genderless Characters", "Transgender Characters"],
+    "ALIGN": ["Good Characters", "Bad Characters", "Neutral Characters", "Reformed Criminals"],
+    "ALIVE": ["Living Characters", "Deceased Characters"],
+}
+
+
+@contextmanager
+def atomicWrite(path):
+    """Yield a temp path to write to; it replaces ``path`` once the write succeeds.
+
+    A crashed run can't leave a half-written file at ``path``, and every
+    writer gets its own temp file, so concurrent runs writing the same path
+    (cron plus parallel workers) don't interleave.
+    """
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                suffix=".tmp")
+    os.close(fd)
+    try:
+        yield temp
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def fileHash(path, blockSize=1 << 20):
+    """sha256 of a file's contents, read in blocks so big scrapes stay cheap."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blockSize), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def contentHash(path, cacheDir=CACHE_DIR):
+    """``fileHash`` of ``path``, remembered in ``cacheDir`` while its size and mtime don't change."""
+    # re-hashing a multi-GB scrape on every run defeats the point of the
+    # cache, so the hash is only recomputed when the file looks different
+    os.makedirs(cacheDir, exist_ok=True)
+    stat = os.stat(path)
+    key = "%s:%d:%d" % (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    index = os.path.join(cacheDir, "hashes.json")
+    try:
+        with open(index) as f:
+            known = json.load(f)
+    except (OSError, ValueError):
+        known = {}
+    if key not in known:
+        known = {k: v for k, v in known.items() if not k.startswith(os.path.abspath(path) + ":")}
+        known[key] = fileHash(path)
+        with atomicWrite(index) as temp, open(temp, "w") as f:
+            json.dump(known, f)
+    return known[key]
+
+
+def cachePath(path, cacheDir=CACHE_DIR, options=None):
+    """Where the columnar copy of ``path`` lives for its current contents.
+
+    ``options`` (the read_csv keyword arguments) are part of the key too, so
+    e.g. a ``usecols`` load never picks up a cache written without it.
+    """
+    os.makedirs(cacheDir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    optionsKey = hashlib.sha256(repr(sorted((options or {}).items())).encode()).hexdigest()
+    return os.path.join(cacheDir, "%s-%s-%s.feather" % (
+        stem, contentHash(path, cacheDir)[:16], optionsKey[:8]))
+
+
+def loadCsv(path="dc-comics.csv", cacheDir=CACHE_DIR, **readOptions):
+    """Load ``path`` as a DataFrame, going through the Feather cache when possible.
+
+    Returns the same frame ``pd.read_csv(path)`` would (same columns, same
+    RangeIndex), so the recodes and later cells don't need to change.
+    """
+    with stage("load", path=path) as s:
+        dc = _loadCsv(path, cacheDir, readOptions)
+        s.rowsOut = len(dc)
+    return dc
+
+
+def _loadCsv(path, cacheDir, readOptions):
+    if pa is None:
+        return pd.read_csv(path, **readOptions)
+
+    cached = cachePath(path, cacheDir, readOptions)
+    if not os.path.exists(cached):
+        dc = pd.read_csv(path, **readOptions)
+        # drop copies of older versions of this CSV, and only this one:
+        # "dc-comics-rescrape.csv" shares the stem's prefix, not its pattern
+        stem, contentKey, _ = os.path.basename(cached).rsplit("-", 2)
+        pattern = re.compile(re.escape(stem) + r"-([0-9a-f]{16})-[0-9a-f]{8}\.feather")
+        for old in os.listdir(cacheDir):
+            match = pattern.fullmatch(old)
+            if match and match.group(1) != contentKey:
+                os.remove(os.path.join(cacheDir, old))
+        with atomicWrite(cached) as temp:
+            feather.write_feather(dc, temp, compression="uncompressed")
+        return dc
+
+    with pa.memory_map(cached) as source:
+        return feather.read_table(source, memory_map=True).to_pandas()
+
+
+def loadCharacters(path="dc-comics.csv", extraColumns=(), cacheDir=CACHE_DIR):
+    """Load just the columns in ``SCHEMA`` (plus ``extraColumns``) with compact dtypes.
+
+    Extra columns such as EYE, HAIR or ID (for stratifying) are read as
+    categoricals.
+    """
+    dtypes = dict(SCHEMA)
+    dtypes.update((column, "category") for column in extraColumns if column not in dtypes)
+    return loadCsv(path, cacheDir, usecols=list(dtypes), dtype=dtypes)
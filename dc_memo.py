@@ -0,0 +1,232 @@
+"""Persistent, content-addressed cache of analysis results.
+
+Every result is stored under a key built from what it depends on: the
+input CSV's content hash, the recode rules, the dropped rows, the strata and
+whatever parameters the step takes (baseline, replicates, seed, ...).  A
+rerun with unchanged inputs reads each table back instead of recomputing
+it, and changing one input (say the baseline) only misses on the results
+that depend on it; the cleaned frame and cube are still reused.
+
+``ResultCache`` is the on-disk store: one pickle per key, bounded in total
+size, evicting the least recently used entries first.  ``CachedAnalysis``
+wires it through the pipeline:
+
+    analysis = CachedAnalysis("dc-comics.csv", strata=["ALIGN", "ALIVE"])
+    analysis.contingency()
+    analysis.multinomial(replicates=100_000)
+
+Results are only as fresh as the code that made them, so bump ``VERSION``
+when a change to the analysis code should invalidate what's on disk.
+"""
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from dc_bootstrap import bootstrapDifference
+from dc_chisquare import BASELINE, chiSquareGrid, getChiSquare, loadBaselines
+from dc_clean import DROPPED_ROWS, cleanFrame
+from dc_concentration import concentration
+from dc_loader import CACHE_DIR, atomicWrite, contentHash, fileHash, loadCharacters
+from dc_montecarlo import multinomialTest
+from dc_rules import RULES_PATH
+from dc_stratify import allStrata, getCube, sourceColumns, strataLevels
+from dc_stream import streamCube
+
+VERSION = 2
+
+RESULTS_DIR = os.path.join(CACHE_DIR, "results")
+
+
+def cacheKey(*parts):
+    """sha256 over ``parts``; frames, series and arrays are hashed by content."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            labels = list(part.columns) if isinstance(part, pd.DataFrame) else part.name
+            digest.update(repr((type(part).__name__, part.shape, labels)).encode())
+            digest.update(pd.util.hash_pandas_object(part).to_numpy().tobytes())
+        elif isinstance(part, np.ndarray):
+            digest.update(repr((part.dtype, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def rulesKey(rules=None):
+    """Cache key part for a ``cleanFrame`` rules argument (None, path, DataFrame or False)."""
+    if rules is False:
+        return "no rules"
+    if rules is None:
+        rules = RULES_PATH
+    if isinstance(rules, str):
+        return fileHash(rules)
+    return cacheKey(rules)
+
+
+class ResultCache:
+    """Size-bounded on-disk store of pickled results, keyed by ``cacheKey``.
+
+    Reading an entry marks it as recently used; writing one evicts the least
+    recently used entries until the cache is back under ``maxBytes``.
+    """
+
+    def __init__(self, directory=RESULTS_DIR, maxBytes=512 * 2**20):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """The value stored under ``key``; raises KeyError if there isn't one."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        # several runs can share a cache, so any entry may be evicted by
+        # another one at any moment; that's fine here and in evict
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key, value):
+        with atomicWrite(self._path(key)) as temp, open(temp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.evict()
+
+    def fetch(self, key, compute):
+        """The value under ``key``, calling ``compute()`` and storing its result on a miss."""
+        try:
+            return self.get(key)
+        except KeyError:
+            value = compute()
+            self.put(key, value)
+            return value
+
+    def entries(self):
+        """(path, size, last used) of every entry, least recently used first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, info.st_size, info.st_mtime_ns))
+        return sorted(entries, key=lambda e: e[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, maxBytes=None):
+        """Drop least recently used entries until the total is at most ``maxBytes``."""
+        maxBytes = self.maxBytes if maxBytes is None else maxBytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= maxBytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        self.evict(0)
+
+
+class CachedAnalysis:
+    """The representation analysis of one CSV, with every step memoized in a ``ResultCache``.
+
+    ``path``, ``rules``, ``dropRows`` and ``strata`` fix the data every result
+    is computed from; each method's own parameters are added to its key.
+    With ``stream`` the cube is built by ``streamCube`` and the cleaned frame
+    is never loaded unless a character-level result asks for it.
+    """
+
+    def __init__(self, path="dc-comics.csv", strata=("ALIGN", "ALIVE"), rules=None,
+                 dropRows=DROPPED_ROWS, cache=None, stream=False, chunksize=1_000_000):
+        self.path = path
+        self.strata = list(strata)
+        self.rules = rules
+        self.dropRows = tuple(dropRows)
+        self.cache = ResultCache() if cache is None else cache
+        self.stream = stream
+        self.chunksize = chunksize
+        self.levels = strataLevels(self.strata)
+        self.dataKey = cacheKey(VERSION, contentHash(path), rulesKey(rules), self.dropRows)
+        self._characters = None
+
+    def _fetch(self, name, compute, *params):
+        return self.cache.fetch(cacheKey(self.dataKey, name, *params), compute)
+
+    def _levels(self, levels):
+        return self.levels if levels is None else [tuple(by) for by in levels]
+
+    def characters(self):
+        """The cleaned frame, with the stratifying columns."""
+        if self._characters is None:
+            extra = sourceColumns(self.strata)
+            self._characters = self._fetch(
+                "characters", lambda: cleanFrame(loadCharacters(self.path, extra), self.dropRows, self.rules),
+                sorted(extra))
+        return self._characters
+
+    def cube(self):
+        def compute():
+            if self.stream:
+                return streamCube(self.path, self.strata, self.chunksize, self.dropRows, self.rules)
+            return getCube(self.characters(), self.strata)
+        return self._fetch("cube", compute, self.strata)
+
+    def observed(self, levels=None):
+        """(strata x gender) appearance sums; every combination of the strata by default."""
+        levels = self._levels(levels)
+        return self._fetch("observed", lambda: allStrata(self.cube(), levels), self.strata, levels)
+
+    def contingency(self, baseline=BASELINE, levels=None):
+        return self._fetch("contingency", lambda: getChiSquare(self.observed(levels), baseline),
+                           self.strata, self._levels(levels), pd.Series(baseline))
+
+    def baselineGrid(self, baselines=None, levels=None):
+        """``chiSquareGrid`` against ``baselines`` (baselines.csv by default)."""
+        baselines = loadBaselines() if baselines is None else baselines
+        return self._fetch("baselines", lambda: chiSquareGrid(self.observed(levels), baselines),
+                           self.strata, self._levels(levels), baselines)
+
+    def concentration(self, by="GENDER", shares=(.01, .10)):
+        return self._fetch("concentration", lambda: concentration(self.characters(), by, shares),
+                           by, shares)
+
+    def multinomial(self, baseline=BASELINE, levels=None, replicates=100_000, seed=0, workers=None):
+        return self._fetch("multinomial",
+                           lambda: multinomialTest(self.observed(levels), baseline, replicates,
+                                                   workers=workers, seed=seed),
+                           self.strata, self._levels(levels), pd.Series(baseline), replicates, seed)
+
+    def bootstrap(self, baseline=BASELINE, levels=None, replicates=10_000, alpha=.05, seed=0, workers=None):
+        levels = self._levels(levels)
+        return self._fetch("bootstrap",
+                           lambda: bootstrapDifference(self.characters(), levels, baseline, replicates,
+                                                       alpha=alpha, workers=workers, seed=seed),
+                           levels, pd.Series(baseline), replicates, alpha, seed)
+
+    def figures(self, outDir="figures", baseline=BASELINE, workers=None):
+        """Render the Expected vs Actual figures; unchanged ones are skipped by their manifest."""
+        from dc_figures import renderFigures
+        return renderFigures(self.contingency(baseline), outDir, workers)
@@ -0,0 +1,150 @@
+"""Simulation-based significance for the chi-square tests.
+
+``stats.chisquare`` reports p = 0 for every stratum, which says nothing about
+how extreme each result is, and the asymptotic approximation is shaky when a
+nonbinary expected count is tiny.  Two simulation modes are offered instead:
+
+- ``multinomialTest``: draw appearance totals from the baseline multinomial
+  and count how often the simulated chi-square is at least the observed one.
+- ``permutationTest``: shuffle GENDER labels across the characters in each
+  stratum, keeping their appearance counts, and compare per-gender sums
+  against what the stratum's own gender mix implies.
+
+Replicates are drawn in large vectorized batches and the batches are spread
+over a process pool.  Every batch gets its own child of one SeedSequence, so
+results only depend on ``seed``, never on the number of workers.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dc_chisquare import BASELINE, chiSquare, getExpected
+from dc_stratify import GENDERS, stratumCharacters
+
+
+def seedBatches(replicates, batchSize, seed):
+    """Split ``replicates`` into (batch size, SeedSequence child) pairs."""
+    sizes = [batchSize] * (replicates // batchSize)
+    if replicates % batchSize:
+        sizes.append(replicates % batchSize)
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+_shared = None
+
+
+def _share(shared):
+    global _shared
+    _shared = shared
+
+
+def _runShared(task, job):
+    return task(_shared, *job)
+
+
+def runJobs(task, jobs, workers, shared=None):
+    """``task(*job)`` for every job, in a process pool unless ``workers`` is 1.
+
+    With ``shared`` (e.g. every stratum's character arrays) each call is
+    ``task(shared, *job)``, and ``shared`` goes to each worker process once,
+    through the pool initializer, so jobs only carry small arguments.
+    """
+    if workers == 1 or len(jobs) == 1:
+        return [task(*job) if shared is None else task(shared, *job) for job in jobs]
+    if shared is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(task, *zip(*jobs)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_share, initargs=(shared,)) as pool:
+        return list(pool.map(_runShared, [task] * len(jobs), jobs))
+
+
+def _pValues(statistic, exceedances, replicates):
+    # (k + 1) / (R + 1) never reports an impossible p = 0; a stratum with
+    # no statistic (no appearances at all) gets no p-value, as in getChiSquare
+    pvalue = np.where(np.isfinite(statistic), (exceedances + 1) / (replicates + 1), np.nan)
+    return pd.DataFrame({
+        'Chi-square': statistic,
+        'Replicates': replicates,
+        'Exceedances': exceedances,
+        'p-value': pvalue,
+        'MC error': np.sqrt(pvalue * (1 - pvalue) / replicates),
+    })
+
+
+def _multinomialBatch(size, seedSeq, totals, baseline, observedStat):
+    rng = np.random.default_rng(seedSeq)
+    # shape (size, S, G): one multinomial draw per replicate per stratum
+    draws = rng.multinomial(totals, baseline, size=(size, len(totals)))
+    statistic, _ = chiSquare(draws, totals[:, None] * baseline)
+    return (statistic >= observedStat).sum(axis=0)
+
+
+def multinomialTest(observed, baseline=BASELINE, replicates=100_000, batchSize=10_000,
+                    workers=None, seed=0):
+    """Monte Carlo chi-square p-values for every stratum in ``observed``.
+
+    ``observed`` is a (strata x gender) table of appearance sums, e.g. from
+    ``allStrata``.  Returns the observed statistic, the number of simulated
+    statistics at least as large, the exact-tail p-value and its Monte Carlo
+    standard error per stratum.
+    """
+    baseline = pd.Series(baseline).reindex(observed.columns).to_numpy(dtype=float)
+    actual = observed.to_numpy(dtype=float)
+    statistic, _ = chiSquare(actual, getExpected(actual, baseline))
+    totals = actual.sum(axis=1).astype(np.int64)
+
+    jobs = [(size, seq, totals, baseline, statistic) for size, seq in seedBatches(replicates, batchSize, seed)]
+    exceedances = np.sum(runJobs(_multinomialBatch, jobs, workers), axis=0)
+    result = _pValues(statistic, exceedances, replicates)
+    result.index = observed.index
+    return result
+
+
+def _permutationStatistic(sums, share):
+    # genders with no characters in the stratum can't differ from zero
+    present = share > 0
+    statistic, _ = chiSquare(sums[..., present], sums.sum(axis=-1, keepdims=True) * share[present])
+    return statistic
+
+
+def _permutationBatch(strata, stratum, size, seedSeq, share, observedStat):
+    genders, appearances = strata[stratum]
+    rng = np.random.default_rng(seedSeq)
+    nGenders = len(share)
+    shuffled = rng.permuted(np.broadcast_to(genders, (size, len(genders))), axis=1)
+    # per-replicate, per-gender sums with one bincount over (replicate, gender)
+    cells = shuffled + nGenders * np.arange(size)[:, None]
+    sums = np.bincount(cells.ravel(), weights=np.broadcast_to(appearances, shuffled.shape).ravel(),
+                       minlength=size * nGenders).reshape(size, nGenders)
+    return int((_permutationStatistic(sums, share) >= observedStat).sum())
+
+
+def permutationTest(dc, levels=((),), replicates=10_000, batchSize=None, workers=None, seed=0):
+    """Permutation p-values: do appearances differ by gender beyond the character mix?
+
+    For each stratum (labelled like ``allStrata``), GENDER labels are shuffled
+    across its characters.  The statistic compares per-gender appearance sums
+    to the sums expected from the stratum's share of characters of each gender.
+    ``batchSize`` defaults to about five million shuffled characters per batch.
+    """
+    statistic, labels, strata, jobs, owner = [], [], [], [], []
+    for label, g, v in stratumCharacters(dc, levels):
+        share = np.bincount(g, minlength=len(GENDERS)) / len(g)
+        observedStat = _permutationStatistic(np.bincount(g, weights=v, minlength=len(GENDERS)), share)
+        batch = batchSize or max(1, 5_000_000 // len(g))
+        for size, seq in seedBatches(replicates, batch, seed):
+            jobs.append((len(strata), size, seq, share, observedStat))
+            owner.append(len(labels))
+        strata.append((g, v))
+        statistic.append(observedStat)
+        labels.append(label)
+
+    # every stratum's batches go through the same pool, which gets the
+    # characters once instead of with every batch
+    exceedances = np.bincount(owner, weights=runJobs(_permutationBatch, jobs, workers, strata),
+                              minlength=len(labels)).astype(np.int64)
+    result = _pValues(np.array(statistic), exceedances, replicates)
+    result.index = pd.Index(labels, name="Stratum")
+    return result
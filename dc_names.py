@@ -0,0 +1,260 @@
+"""Character name index: exact base-name lookup plus multi-pattern substring search.
+
+Wiki names look like "Bianca Reyes (New Earth)": a base name followed by a
+parenthesised universe.  ``NameIndex`` is built once per dataset and answers
+two kinds of queries:
+
+- ``lookup``: exact match on the normalized base name, so "Bia" only finds
+  "Bia (...)" and never "Bianca Reyes (...)".
+- ``contains``: substring search for many patterns at once, optionally
+  restricted to whole words, over each distinct name once.  With
+  pyahocorasick installed, one compiled Aho-Corasick automaton scans every
+  name in a single pass.  Otherwise a short list (up to ``REGEX_PATTERNS``)
+  is a ``str.contains`` alternation of the escaped patterns, and anything
+  longer goes to the pure-Python ``AhoCorasick`` below, whose cost doesn't
+  grow with the number of patterns.
+
+The base name is also a character's identity across universes: the index
+hashes every row to an identity code, and ``identityTotals`` rolls
+appearances up per identity (Harley Quinn's New Earth and Prime Earth
+appearances together).
+"""
+
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - pyahocorasick isn't a hard requirement
+    ahocorasick = None
+
+NAME_PATTERN = r"^\s*(?P<base>.*?)\s*(?:\((?P<universe>[^()]*)\))?\s*$"
+
+# without pyahocorasick, longer pattern lists go to the pure-Python
+# automaton: it costs ~1.5s per 300k names whatever the list's length, while
+# a regex alternation (without pyarrow, in Python's re) adds ~17ms a pattern
+REGEX_PATTERNS = 50
+
+
+def normalizeName(names, casefold=True):
+    """Casefold (unless told not to) and collapse whitespace; works on a string or a Series."""
+    if isinstance(names, pd.Series):
+        names = names.str.casefold() if casefold else names
+        return names.str.replace(r"\s+", " ", regex=True).str.strip()
+    names = str(names)
+    return " ".join((names.casefold() if casefold else names).split())
+
+
+def splitNames(names):
+    """Split a Series of wiki names into "base" and "universe" columns.
+
+    Gives the same split as ``names.str.extract(NAME_PATTERN)``, but as two
+    anchored regex replaces, which Arrow-backed strings run natively; that
+    is several times faster than a capture-group extract on big scrapes.
+    """
+    names = names.astype("string").str.strip()
+    base = names.str.replace(r"\s*\([^()]*\)$", "", regex=True)
+    # only names that lost a "(...)" suffix have a universe, and in those
+    # the last "(" is the one that opens it
+    suffixed = base.str.len() != names.str.len()
+    universe = names.where(suffixed).str.replace(r"(?s)^.*\(", "", regex=True).str[:-1]
+    return pd.DataFrame({"base": base, "universe": universe}, index=names.index)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher; finds every pattern occurrence in a single scan."""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for i, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                if ch not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][ch] = len(self._goto) - 1
+                node = self._goto[node][ch]
+            self._out[node].append(i)
+
+        # depth-1 nodes already fail to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text):
+        """Yield (start, end, pattern index) for every match in ``text``."""
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for i in out[node]:
+                yield end - len(self.patterns[i]), end, i
+
+
+class _CompiledAhoCorasick:
+    """``AhoCorasick``'s interface over a pyahocorasick automaton."""
+
+    def __init__(self, patterns):
+        self.automaton = ahocorasick.Automaton()
+        for i, pattern in enumerate(patterns):
+            self.automaton.add_word(pattern, (i, len(pattern)))
+        self.automaton.make_automaton()
+
+    def finditer(self, text):
+        for last, (i, length) in self.automaton.iter(text):
+            yield last + 1 - length, last + 1, i
+
+
+def _isWholeWord(text, start, end):
+    return ((start == 0 or not text[start - 1].isalnum())
+            and (end == len(text) or not text[end].isalnum()))
+
+
+class _DistinctNames:
+    """Each distinct name stored once, with codes mapping rows to it."""
+
+    def __init__(self, names):
+        self.codes, uniques = pd.factorize(names)
+        self.uniques = uniques.tolist()
+        self._text = None
+
+    def text(self):
+        """Every distinct name in one string, and where each one starts in it.
+
+        The automaton then scans all the names in one run; "\\n" can't be in
+        a normalized name and isn't alphanumeric.
+        """
+        if self._text is None:
+            lengths = np.fromiter(map(len, self.uniques), dtype=np.intp, count=len(self.uniques))
+            self._text = "\n".join(self.uniques), np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+        return self._text
+
+
+class NameIndex:
+    """Index over a Series of character names, built once per dataset."""
+
+    def __init__(self, names):
+        self.names = names
+        parts = splitNames(names)
+        self.universe = parts.universe
+        self.base = parts.base
+        # casefolded for contains, plus (on first use) as spelled
+        self._distinct = {False: _DistinctNames(normalizeName(names))}
+        # a character's identity is its normalized base name, shared by all
+        # of its universes; identity[row] indexes identities (-1: no name)
+        self.identity, self.identities = pd.factorize(normalizeName(parts.base))
+        order = np.argsort(self.identity, kind="stable")
+        bounds = np.searchsorted(self.identity[order], np.arange(len(self.identities) + 1))
+        self._byBase = {base: order[bounds[i]:bounds[i + 1]] for i, base in enumerate(self.identities)}
+        self._automata = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def positions(self, bases):
+        """Row positions whose base name exactly matches any of ``bases``."""
+        if isinstance(bases, str):
+            bases = [bases]
+        found = [self._byBase.get(normalizeName(b)) for b in bases]
+        found = [f for f in found if f is not None]
+        return np.sort(np.concatenate(found)) if found else np.array([], dtype=np.intp)
+
+    def lookup(self, bases):
+        """Boolean row mask for an exact base-name match against ``bases``."""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.positions(bases)] = True
+        return mask
+
+    def contains(self, patterns, wholeWord=True, caseSensitive=False):
+        """Boolean row mask for names containing any of ``patterns``.
+
+        With ``wholeWord`` a pattern only counts when it isn't part of a
+        longer word, so "Bia" no longer matches "Bianca".  Case is ignored
+        unless ``caseSensitive``; with ``wholeWord=False`` that matches like
+        ``str.contains`` on the escaped patterns joined by "|".
+        """
+        casefold = not caseSensitive
+        if caseSensitive not in self._distinct:
+            self._distinct[caseSensitive] = _DistinctNames(normalizeName(self.names, casefold))
+        distinct = self._distinct[caseSensitive]
+        patterns = tuple(dict.fromkeys(normalizeName(p, casefold) for p in patterns))
+        mask = np.zeros(len(self), dtype=bool)
+        if not patterns:
+            return mask
+        if ahocorasick is None and len(patterns) <= REGEX_PATTERNS:
+            hits = self._regexHits(distinct, patterns, wholeWord)
+        else:
+            hits = self._automatonHits(distinct, patterns, wholeWord)
+        valid = distinct.codes >= 0
+        mask[valid] = hits[distinct.codes[valid]]
+        return mask
+
+    def _regexHits(self, distinct, patterns, wholeWord):
+        alternation = "|".join(re.escape(p) for p in patterns)
+        uniques = pd.Series(distinct.uniques, dtype="string")
+        hits = uniques.str.contains(alternation, regex=True).to_numpy(dtype=bool, na_value=False)
+        if wholeWord:
+            # the regex spelling of _isWholeWord (no letter or digit either
+            # side) needs lookarounds, so only the candidates are rechecked
+            search = re.compile(r"(?<![^\W_])(?:%s)(?![^\W_])" % alternation).search
+            candidates = np.flatnonzero(hits)
+            hits[candidates] = [search(distinct.uniques[u]) is not None for u in candidates]
+        return hits
+
+    def _automatonHits(self, distinct, patterns, wholeWord):
+        if patterns not in self._automata:
+            self._automata[patterns] = (AhoCorasick(patterns) if ahocorasick is None
+                                        else _CompiledAhoCorasick(patterns))
+        text, starts = distinct.text()
+        ends = [end for start, end, _ in self._automata[patterns].finditer(text)
+                if not wholeWord or _isWholeWord(text, start, end)]
+        hits = np.zeros(len(distinct.uniques), dtype=bool)
+        hits[np.searchsorted(starts, np.asarray(ends, dtype=np.intp), side="right") - 1] = True
+        return hits
+
+
+def identityTotals(dc, names=None, value="APPEARANCES"):
+    """Roll ``value`` up per base character across all of their universes.
+
+    "Harley Quinn (New Earth)" and "Harley Quinn (Prime Earth)" are one
+    identity.  Returns one row per identity, indexed by normalized base
+    name, with the first spelling seen as Name, how many Universes (a name
+    with no universe counts as one) and Characters (rows) it covers, and the
+    total ``value``.  Pass a
+    ``NameIndex`` of ``dc.name`` as ``names`` to reuse one already built.
+    """
+    names = NameIndex(dc.name) if names is None else names
+    identity = names.identity
+    valid = identity >= 0
+    identity = identity[valid]
+    values = np.nan_to_num(dc[value].to_numpy(dtype=float)[valid])
+    n = len(names.identities)
+
+    first = np.full(n, len(identity))
+    np.minimum.at(first, identity, np.arange(len(identity)))
+    universeCodes = pd.factorize(names.universe.to_numpy()[valid], use_na_sentinel=False)[0]
+    pairs = np.unique(identity.astype(np.int64) * (universeCodes.max(initial=0) + 1) + universeCodes)
+    universes = np.bincount(pairs // (universeCodes.max(initial=0) + 1), minlength=n)
+
+    return pd.DataFrame({
+        "Name": names.base.to_numpy()[valid][first],
+        "Universes": universes,
+        "Characters": np.bincount(identity, minlength=n),
+        value: np.bincount(identity, weights=values, minlength=n),
+    }, index=pd.Index(names.identities, name="Identity"))
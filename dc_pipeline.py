@@ -0,0 +1,238 @@
+"""The analysis as a DAG of named stages, rerunning only what's stale.
+
+Each stage declares the stages it takes as inputs and the parameters it
+depends on (its ``key``).  A stage's fingerprint hashes its name, key and
+the fingerprints of its inputs, so editing one input (say the recode rules)
+changes the fingerprints of that stage and everything downstream of it, and
+nothing else.  ``Pipeline.run`` works back from the requested targets:
+
+- a stage whose fingerprint is already known (from earlier in the session,
+  or in the ``ResultCache``) isn't run, and neither is anything upstream of
+  it unless some stale stage needs its output;
+- stale stages are submitted to a thread pool (or any executor passed in)
+  as soon as their inputs are ready, so independent branches run together.
+
+``analysisPipeline`` builds the standard load -> drop -> recode -> filter ->
+cube -> contingency DAG, with one chi-square stage per stratification level
+plus concentration, baseline grid and figures as side branches:
+
+    pipeline = analysisPipeline("dc-comics.csv", cache=ResultCache())
+    results = pipeline.run(["contingency", "concentration"])
+    pipeline.lastRun   # the stages that actually ran
+"""
+
+import functools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from dc_chisquare import BASELINE, chiSquareGrid, getChiSquare
+from dc_clean import DROPPED_ROWS, dropUnusable, recodeGender, validateCategories
+from dc_concentration import concentration
+from dc_loader import contentHash, loadCharacters
+from dc_memo import VERSION, cacheKey, rulesKey
+from dc_stratify import allStrata, getCube, sourceColumns, strataLevels
+from dc_stream import streamCube
+from dc_trace import getTracer, stage
+
+
+class Stage:
+    """One step of a ``Pipeline``: ``func(*inputs)`` plus what its result depends on."""
+
+    def __init__(self, name, func, inputs=(), key=(), persist=True):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.key = tuple(key)
+        self.persist = persist
+
+
+def _rows(*values):
+    # rows across every table in values, or None if none of them is one
+    tables = [v for v in values if isinstance(v, (pd.DataFrame, pd.Series))]
+    return sum(map(len, tables)) if tables else None
+
+
+def _runStage(name, func, args):
+    with stage(name, rowsIn=_rows(*args), pipeline=True) as s:
+        value = func(*args)
+        s.rowsOut = _rows(value)
+    return value
+
+
+class Pipeline:
+    """A DAG of ``Stage``s; see the module docstring.
+
+    Stage outputs are kept in memory for the session, and written to
+    ``cache`` (a ``ResultCache``) unless the stage was added with
+    ``persist=False``, which suits stages that are cheaper to recompute
+    than to store.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.stages = {}
+        self.lastRun = []
+        self._values = {}
+
+    def add(self, name, func, inputs=(), key=(), persist=True):
+        """Add a stage; its inputs must already be in the pipeline, which keeps it acyclic."""
+        if name in self.stages:
+            raise ValueError("duplicate stage %r" % name)
+        missing = [i for i in inputs if i not in self.stages]
+        if missing:
+            raise ValueError("stage %r needs unknown stages: %s" % (name, ", ".join(missing)))
+        self.stages[name] = Stage(name, func, inputs, key, persist)
+        return self
+
+    def fingerprints(self):
+        """Fingerprint of every stage; stages are stored in dependency order."""
+        fingerprints = {}
+        for name, s in self.stages.items():
+            fingerprints[name] = cacheKey(VERSION, name, s.key, *[fingerprints[i] for i in s.inputs])
+        return fingerprints
+
+    def _known(self, name, fingerprint):
+        if fingerprint in self._values:
+            return True
+        return self.stages[name].persist and self.cache is not None and fingerprint in self.cache
+
+    def plan(self, targets, fingerprints=None):
+        """The stages ``run(targets)`` would run, in dependency order."""
+        fingerprints = fingerprints or self.fingerprints()
+        stale = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name in stale or self._known(name, fingerprints[name]):
+                continue
+            stale.add(name)
+            todo.extend(self.stages[name].inputs)
+        return [name for name in self.stages if name in stale]
+
+    def _value(self, name, fingerprint):
+        if fingerprint not in self._values:
+            self._values[fingerprint] = self.cache.get(fingerprint)
+        return self._values[fingerprint]
+
+    def run(self, targets=None, workers=None, executor=None):
+        """Bring ``targets`` (default: every stage) up to date; returns their values by name.
+
+        Stale stages run on ``executor`` if given (a ProcessPoolExecutor
+        needs picklable stage functions), otherwise on a thread pool of
+        ``workers`` threads, or one at a time while a tracer is recording
+        memory: tracemalloc's peak is process-wide, so overlapping stages
+        would each be charged for the others' allocations.
+        """
+        targets = list(self.stages) if targets is None else list(targets)
+        tracer = getTracer()
+        if tracer is not None and tracer.memory:
+            workers = 1
+        fingerprints = self.fingerprints()
+        self.lastRun = self.plan(targets, fingerprints)
+        waiting = {name: {i for i in self.stages[name].inputs if i in self.lastRun} for name in self.lastRun}
+
+        pool = executor or ThreadPoolExecutor(workers)
+        try:
+            running = {}
+            while waiting or running:
+                for name in [n for n, deps in waiting.items() if not deps]:
+                    del waiting[name]
+                    s = self.stages[name]
+                    args = [self._value(i, fingerprints[i]) for i in s.inputs]
+                    running[pool.submit(_runStage, name, s.func, args)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    value = future.result()
+                    self._values[fingerprints[name]] = value
+                    if self.stages[name].persist and self.cache is not None:
+                        self.cache.put(fingerprints[name], value)
+                    for deps in waiting.values():
+                        deps.discard(name)
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+        results = {name: self._value(name, fingerprints[name]) for name in targets}
+        # outputs of stages that have since changed are no use any more
+        current = set(fingerprints.values())
+        self._values = {fp: v for fp, v in self._values.items() if fp in current}
+        return results
+
+
+def levelName(by):
+    """Stage-name suffix for a stratification level: "All", "ALIGN", "ALIGN/ALIVE"."""
+    return "/".join(by) or "All"
+
+
+def _dropRows(dc, rows):
+    return dc.drop([row for row in rows if row in dc.index])
+
+
+def _recode(dc, rules):
+    return validateCategories(recodeGender(dc, rules))
+
+
+def _concat(*tables):
+    return pd.concat(tables)
+
+
+def _renderFigures(contingency, outDir, workers):
+    from dc_figures import renderFigures
+    return renderFigures(contingency, outDir, workers)
+
+
+def analysisPipeline(path="dc-comics.csv", strata=("ALIGN", "ALIVE"), baseline=BASELINE, rules=None,
+                     dropRows=DROPPED_ROWS, baselines=None, stream=False, chunksize=1_000_000,
+                     figuresDir=None, figureWorkers=None, cache=None):
+    """The representation analysis of ``path`` as a ``Pipeline``.
+
+    Stages: load, drop, recode, filter, cube, concentration, one
+    "contingency ALIGN"-style chi-square stage per stratification level,
+    contingency (all levels stacked), and optionally baselines and figures.
+    With ``stream`` the cube comes straight from ``streamCube`` and there are
+    no frame-level stages.
+    """
+    strata = list(strata)
+    dropRows = tuple(dropRows)
+    data = contentHash(path)
+    pipeline = Pipeline(cache)
+    if stream:
+        pipeline.add("cube", functools.partial(streamCube, path, strata, chunksize, dropRows, rules),
+                     key=(data, rulesKey(rules), dropRows, strata))
+    else:
+        extra = sourceColumns(strata)
+        # loading is already cached as Feather, and the frames before
+        # filtering aren't worth a second copy on disk
+        pipeline.add("load", functools.partial(loadCharacters, path, extra), key=(data, sorted(extra)),
+                     persist=False)
+        pipeline.add("drop", functools.partial(_dropRows, rows=dropRows), ["load"], key=(dropRows,),
+                     persist=False)
+        pipeline.add("recode", functools.partial(_recode, rules=rules), ["drop"], key=(rulesKey(rules),),
+                     persist=False)
+        pipeline.add("filter", dropUnusable, ["recode"])
+        pipeline.add("cube", functools.partial(getCube, strata=strata), ["filter"], key=(strata,))
+        pipeline.add("concentration", functools.partial(concentration, by="GENDER"), ["filter"],
+                     key=("GENDER",))
+
+    baseline = pd.Series(baseline)
+    levels = strataLevels(strata)
+    for by in levels:
+        pipeline.add("observed " + levelName(by), functools.partial(allStrata, levels=[by]), ["cube"],
+                     key=(by,), persist=False)
+        pipeline.add("contingency " + levelName(by), functools.partial(getChiSquare, baseline=baseline),
+                     ["observed " + levelName(by)], key=(baseline,))
+    pipeline.add("contingency", _concat, ["contingency " + levelName(by) for by in levels], persist=False)
+
+    if baselines is not None:
+        pipeline.add("observed", functools.partial(allStrata, levels=levels), ["cube"], key=(levels,),
+                     persist=False)
+        pipeline.add("baselines", functools.partial(chiSquareGrid, baselines=baselines), ["observed"],
+                     key=(baselines,))
+    if figuresDir is not None:
+        # the figures keep their own manifest of what's drawn, so across
+        # runs only figures whose data changed are redrawn anyway
+        pipeline.add("figures", functools.partial(_renderFigures, outDir=figuresDir, workers=figureWorkers),
+                     ["contingency"], persist=False)
+    return pipeline
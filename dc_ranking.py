@@ -0,0 +1,76 @@
+"""Per-group sorted indexes for instant top-k character queries.
+
+``dc[(dc.GENDER == ...) & (dc.ALIVE == ...) & (dc.ALIGN == ...)].head(5)``
+builds a boolean mask over every row for each filter, and only gives the
+top five because the file happens to be sorted by appearances.  A
+``RankIndex`` is built once (one lexsort) and holds, for every GENDER x
+ALIVE x ALIGN cell, that cell's row positions sorted by APPEARANCES,
+highest first.  A top-k query picks the cells matching its filters and
+lazily merges their lists with ``heapq.merge``, stopping after k rows, so
+it never touches rows outside the first k of each selected cell.  A YEAR
+range first narrows the selected cells with a vectorized mask.
+"""
+
+import heapq
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+
+class RankIndex:
+    """Row positions of every ``columns`` cell, sorted by ``value`` descending.
+
+    Ties keep file order, and characters with no ``value`` come last.
+    """
+
+    def __init__(self, dc, columns=("GENDER", "ALIVE", "ALIGN"), value="APPEARANCES"):
+        self.dc = dc
+        self.columns = list(columns)
+        self.value = value
+        grouped = dc.groupby(self.columns, sort=False, observed=True, dropna=False)
+        codes = grouped.ngroup().to_numpy(dtype=np.intp)
+        labels = grouped.size().index
+
+        self._sortValues = np.nan_to_num(dc[value].to_numpy(dtype=float, na_value=np.nan), nan=-np.inf)
+        order = np.lexsort((np.arange(len(dc)), -self._sortValues, codes))
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels)))])
+        # every cell's list is a slice of the one sorted array
+        self.cells = {(key if isinstance(key, tuple) else (key,)): order[bounds[i]:bounds[i + 1]]
+                      for i, key in enumerate(labels)}
+        self._years = dc.YEAR.to_numpy(dtype=float, na_value=np.nan) if "YEAR" in dc.columns else None
+
+    def _cells(self, where):
+        unknown = [c for c in where if c not in self.columns]
+        if unknown:
+            raise ValueError("can't filter on %s (choose from %s)" % (", ".join(unknown), ", ".join(self.columns)))
+        wanted = []
+        for column in self.columns:
+            labels = where.get(column)
+            if labels is not None and not pd.api.types.is_list_like(labels):
+                labels = [labels]
+            wanted.append(None if labels is None else set(labels))
+        return [cell for key, cell in self.cells.items()
+                if all(w is None or k in w for k, w in zip(key, wanted))]
+
+    def positions(self, k=5, yearFrom=None, yearTo=None, **where):
+        """Row positions of the top ``k`` rows matching ``where`` (column=label or list of labels).
+
+        ``yearFrom`` / ``yearTo`` are inclusive bounds on YEAR (characters
+        without one drop out); each selected cell is narrowed to them with one
+        vectorized mask before the merge, so a range matching few rows never
+        walks the cells in Python.
+        """
+        cells = self._cells(where)
+        if yearFrom is not None or yearTo is not None:
+            lo = -np.inf if yearFrom is None else yearFrom
+            hi = np.inf if yearTo is None else yearTo
+            with np.errstate(invalid="ignore"):
+                cells = [cell[(self._years[cell] >= lo) & (self._years[cell] <= hi)] for cell in cells]
+        values = self._sortValues
+        merged = heapq.merge(*cells, key=lambda p: (-values[p], p))
+        return np.fromiter(islice(merged, k), dtype=np.intp)
+
+    def top(self, k=5, yearFrom=None, yearTo=None, **where):
+        """The top ``k`` matching rows of the frame, e.g. ``top(5, GENDER="Female Characters")``."""
+        return self.dc.iloc[self.positions(k, yearFrom, yearTo, **where)]
@@ -0,0 +1,130 @@
+"""Headless batch entry point for the representation analysis.
+
+Runs the whole pipeline (load, recode, drop null/genderless, stratify,
+chi-square, concentration) without Jupyter and writes the tables to disk:
+
+    python dc_report.py dc-comics.csv --out results/
+    python dc_report.py scrape.csv --strata ALIGN ALIVE DECADE --stream
+    python dc_report.py dc-comics.csv --figures
+
+Result tables are kept in a results cache between runs (see dc_memo), so a
+rerun on an unchanged CSV just reads them back; ``--no-cache`` turns that off.
+
+Only pandas, NumPy and scipy.special are imported up front; matplotlib and
+seaborn are only loaded (in the rendering workers) when ``--figures`` asks
+for plots, so start-up stays fast for cron jobs and parallel workers.
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from dc_chisquare import BASELINE, chiSquareGrid, getChiSquare, loadBaselines
+from dc_clean import cleanFrame
+from dc_concentration import concentration
+from dc_loader import loadCharacters
+from dc_memo import RESULTS_DIR, ResultCache
+from dc_pipeline import analysisPipeline
+from dc_stratify import allStrata, getCube, sourceColumns, strataLevels
+from dc_stream import streamCube
+from dc_trace import Tracer, setTracer
+
+
+def parseBaseline(text):
+    """"0.507,0.489,0.004" -> baseline Series in Female, Male, Nonbinary order."""
+    values = [float(v) for v in text.split(",")]
+    if len(values) != len(BASELINE):
+        raise argparse.ArgumentTypeError("baseline needs %d proportions" % len(BASELINE))
+    return pd.Series(values, index=BASELINE.index)
+
+
+def runAnalysis(path, strata=("ALIGN", "ALIVE"), baseline=BASELINE, stream=False, chunksize=1_000_000,
+                baselines=None, cache=None):
+    """Run the analysis on ``path``; returns a dict of result tables by name.
+
+    ``baselines`` is an optional (baselines x gender) table; when given, every
+    stratum is also tested against every baseline.  With a ``ResultCache``
+    the analysis runs as a ``dc_pipeline`` DAG: stages whose inputs haven't
+    changed since an earlier run are read back instead of recomputed, and
+    independent stages run concurrently.
+    """
+    if cache is not None:
+        pipeline = analysisPipeline(path, strata, baseline, baselines=baselines, stream=stream,
+                                    chunksize=chunksize, cache=cache)
+        targets = ["cube", "contingency"] + ([] if stream else ["concentration"])
+        return pipeline.run(targets + ([] if baselines is None else ["baselines"]))
+
+    results = {}
+    if stream:
+        cube = streamCube(path, strata, chunksize=chunksize)
+    else:
+        dc = cleanFrame(loadCharacters(path, sourceColumns(strata)))
+        cube = getCube(dc, strata)
+        results["concentration"] = concentration(dc, "GENDER")
+    results["cube"] = cube
+    observed = allStrata(cube, strataLevels(strata))
+    results["contingency"] = getChiSquare(observed, baseline)
+    if baselines is not None:
+        results["baselines"] = chiSquareGrid(observed, baselines)
+    return results
+
+
+def writeResults(results, outDir):
+    os.makedirs(outDir, exist_ok=True)
+    for name, table in results.items():
+        table.to_csv(os.path.join(outDir, name + ".csv"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("input", nargs="?", default="dc-comics.csv", help="wiki-scrape CSV")
+    parser.add_argument("--out", default="results", help="directory for the output tables")
+    parser.add_argument("--strata", nargs="*", default=["ALIGN", "ALIVE"],
+                        help="columns to stratify by (DECADE is derived from YEAR, UNIVERSE from name)")
+    parser.add_argument("--baseline", type=parseBaseline, default=BASELINE,
+                        help="female,male,nonbinary population shares (default: US census)")
+    parser.add_argument("--baselines", type=loadBaselines, metavar="CSV",
+                        help="table of alternative baselines to test every stratum against")
+    parser.add_argument("--stream", action="store_true",
+                        help="aggregate in chunks for inputs that don't fit in memory")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--figures", action="store_true",
+                        help="also render Expected vs Actual figures into OUT/figures")
+    parser.add_argument("--workers", type=int, default=None, help="processes for figure rendering")
+    parser.add_argument("--cache-dir", default=RESULTS_DIR, help="where to keep results between runs")
+    parser.add_argument("--cache-size", type=float, default=512, metavar="MB",
+                        help="evict least recently used results beyond this size")
+    parser.add_argument("--no-cache", action="store_true", help="recompute everything, without the results cache")
+    parser.add_argument("--trace", metavar="JSON", help="write per-stage timings to this file")
+    parser.add_argument("--chrome-trace", metavar="JSON", help="also write them in Chrome trace format")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record peak memory per stage too (slower, uses tracemalloc)")
+    args = parser.parse_args(argv)
+
+    tracer = None
+    if args.trace or args.chrome_trace:
+        tracer = Tracer(memory=args.trace_memory)
+        setTracer(tracer)
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_size * 2**20))
+    results = runAnalysis(args.input, args.strata, args.baseline, args.stream, args.chunksize,
+                          args.baselines, cache)
+    writeResults(results, args.out)
+    if args.figures:
+        from dc_figures import renderFigures
+        renderFigures(results["contingency"], os.path.join(args.out, "figures"), args.workers)
+
+    if tracer is not None:
+        tracer.close()
+        setTracer(None)
+        if args.trace:
+            tracer.toJson(args.trace)
+        if args.chrome_trace:
+            tracer.toChromeTrace(args.chrome_trace)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Declarative recode rules, applied in one vectorized pass.
+
+A rules table has one row per correction:
+
+- ``match_key``: the character's name.  A bare name ("Daystar") matches that
+  base name in any universe; a name with a suffix ("Daystar (New Earth)")
+  only matches that exact wiki entry.  Matching ignores case and spacing.
+- ``column``: the column to change (usually GENDER).
+- ``value``: the new value.
+- ``transgender``: optional; "Yes" also sets the Transgender column.
+
+All rules are matched with a single hashed join on normalized names rather
+than one ``str.contains`` scan per rule, and every run reports which rules
+matched no rows or more than one row.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from dc_names import normalizeName, splitNames
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gender_recodes.csv")
+
+
+def loadRules(path=RULES_PATH):
+    """Read a rules table (CSV) into the shape ``applyRules`` expects."""
+    rules = pd.read_csv(path, dtype=str)
+    rules["transgender"] = rules.get("transgender", pd.Series(index=rules.index, dtype=str)).fillna("")
+    rules["transgender"] = rules.transgender.str.strip().str.casefold().isin(["yes", "true", "1"])
+    return rules
+
+
+def _matchRules(names, rules):
+    # each rule keys on either the full name or the base name, so build both
+    # keys for every row and join the rules against whichever applies
+    fullKey = normalizeName(names)
+    baseKey = normalizeName(splitNames(names).base)
+    ruleKey = normalizeName(rules.match_key)
+    onFull = rules.match_key.str.contains(r"\(", regex=True)
+
+    rows = pd.DataFrame({"row": np.arange(len(names)), "full": fullKey.to_numpy(), "base": baseKey.to_numpy()})
+    keyed = pd.DataFrame({"rule": np.arange(len(rules)), "key": ruleKey.to_numpy()})
+    matches = pd.concat([
+        rows.merge(keyed[onFull.to_numpy()], left_on="full", right_on="key"),
+        rows.merge(keyed[~onFull.to_numpy()], left_on="base", right_on="key"),
+    ])
+    return matches[["row", "rule"]]
+
+
+def applyRules(dc, rules=None):
+    """Apply every rule to ``dc``; returns (recoded frame, audit report).
+
+    The report is the rules table with a ``matches`` count and a ``status``
+    of "ok", "no match" or "multiple matches" per rule.
+    """
+    rules = loadRules() if rules is None else rules
+    matches = _matchRules(dc.name, rules)
+
+    dc = dc.copy()
+    hits = matches.assign(column=rules.column.to_numpy()[matches.rule],
+                          value=rules.value.to_numpy()[matches.rule])
+    trans = matches[rules.transgender.to_numpy()[matches.rule]]
+    hits = pd.concat([hits, trans.assign(column="Transgender", value="Yes")])
+    # one vectorized write per target column, however many rules there are
+    for column, group in hits.groupby("column"):
+        if column in dc.columns and isinstance(dc[column].dtype, pd.CategoricalDtype):
+            # stay categorical; a recode to a new label adds it as a category
+            current = dc[column]
+            values = current.cat.add_categories(pd.Index(group.value.unique()).difference(current.cat.categories))
+        else:
+            values = pd.Series(dc[column] if column in dc.columns else np.nan, index=dc.index, dtype=object)
+        values.iloc[group.row.to_numpy()] = group.value.to_numpy()
+        dc[column] = values
+
+    report = rules.copy()
+    report["matches"] = np.bincount(matches.rule, minlength=len(rules))
+    report["status"] = np.select([report.matches == 0, report.matches > 1],
+                                 ["no match", "multiple matches"], "ok")
+    return dc, report
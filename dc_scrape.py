@@ -0,0 +1,506 @@
+"""Concurrent re-scrape of the DC fandom wiki into the dc-comics.csv layout.
+
+The 2014 scrape is stale, and fetching tens of thousands of character pages
+one at a time takes days.  This goes through the wiki's MediaWiki API
+instead, with asyncio:
+
+- category listings (e.g. Category:Transgender_Characters) are paged through
+  500 members at a time;
+- pages are fetched 50 titles per request: one query for their wikitext,
+  whose character infobox gives SEX, ALIGN, ALIVE, ID, EYE, HAIR, GSM and
+  the first appearance (hence YEAR), and one for the size of each
+  character's "/Appearances" category, which is APPEARANCES;
+- requests share a pool of keep-alive HTTP/1.1 connections, which also caps
+  how many are in flight, are spaced out by a rate limit, and are retried
+  with exponential backoff on connection errors, 429s and 5xxs;
+- every finished batch is appended to a checkpoint file, so an interrupted
+  scrape picks up where it stopped.
+
+The output has the same columns as dc-comics.csv, so ``loadCharacters`` and
+the rest of the analysis read it unchanged.  ``StubWiki`` serves canned
+characters from a local port, for trying it all offline:
+
+    python dc_scrape.py https://dc.fandom.com --out rescrape.csv --checkpoint rescrape.jsonl
+    python dc_scrape.py --stub dc-comics.csv --out rescrape.csv
+
+Only the standard library is used for HTTP, so no extra packages are needed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import ssl
+import sys
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import pandas as pd
+
+COLUMNS = ["page_id", "name", "urlslug", "ID", "ALIGN", "EYE", "HAIR", "SEX", "GSM", "ALIVE",
+           "APPEARANCES", "FIRST APPEARANCE", "YEAR"]
+
+API_PATH = "/api.php"
+
+# titles per query; MediaWiki's limit for clients without the bot right
+BATCH = 50
+
+# character infobox parameter -> dc-comics.csv column
+FIELDS = {
+    "Identity": "ID",
+    "Alignment": "ALIGN",
+    "Eyes": "EYE",
+    "Hair": "HAIR",
+    "Gender": "SEX",
+    "Sexuality": "GSM",
+    "Status": "ALIVE",
+    "First": "FIRST APPEARANCE",
+}
+
+# infobox values whose dc-comics.csv label isn't just value + suffix
+LABELS = {
+    "ID": {"Secret": "Secret Identity", "Public": "Public Identity", "Unknown": "Identity Unknown"},
+    "ALIGN": {"Good": "Good Characters", "Bad": "Bad Characters", "Evil": "Bad Characters",
+              "Neutral": "Neutral Characters", "Reformed": "Reformed Criminals"},
+    "ALIVE": {"Alive": "Living Characters", "Deceased": "Deceased Characters"},
+    "HAIR": {"Bald": "Bald"},
+    # the 2014 scrape only lists gender and sexual minorities
+    "GSM": {"Heterosexual": None},
+}
+SUFFIXES = {"EYE": " Eyes", "HAIR": " Hair", "SEX": " Characters", "GSM": " Characters"}
+
+_PARAM = re.compile(r"^\s*\|\s*([^=|\n]+?)\s*=[ \t]*(.*?)\s*$", re.M)
+_LINK = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+_NOISE = re.compile(r"<ref[^>]*?/>|<ref.*?</ref>|<[^>]+>|\{\{[^{}]*\}\}", re.S)
+_YEAR = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+
+class HTTPError(Exception):
+    """A response that retrying won't fix (e.g. 404)."""
+
+    def __init__(self, status, target):
+        super().__init__("HTTP %d for %s" % (status, target))
+        self.status = status
+
+
+class _Connection:
+    """One HTTP/1.1 connection, reused for as long as the server keeps it open."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    async def get(self, host, target):
+        request = "GET %s HTTP/1.1\r\nHost: %s\r\nUser-Agent: dc-representation-scraper\r\n" \
+                  "Accept: application/json\r\nConnection: keep-alive\r\n\r\n" % (target, host)
+        self.writer.write(request.encode("latin-1"))
+        await self.writer.drain()
+
+        statusLine = await self.reader.readline()
+        if not statusLine:
+            raise ConnectionError("server closed the connection")
+        version, status = statusLine.decode("latin-1").split(" ", 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._readChunked()
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self.reader.read()
+            self.reusable = False
+        if headers.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+            self.reusable = False
+        return int(status), headers, body
+
+    async def _readChunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # skip any trailers up to the blank line
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive connections to one host, with at most ``size`` in use at once."""
+
+    def __init__(self, host, port, useSsl=False, size=8):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if useSsl else None
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl, server_hostname=self.host if self.ssl else None)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    def release(self, connection):
+        if connection.reusable:
+            self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle = []
+
+
+class RateLimiter:
+    """Spaces calls to ``wait`` at least 1/``rate`` seconds apart (no limit if rate is falsy)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        delay = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class WikiClient:
+    """MediaWiki API client for one wiki; see the module docstring."""
+
+    def __init__(self, baseUrl, concurrency=8, rate=10, retries=4, backoff=.5, timeout=30):
+        parts = urlsplit(baseUrl)
+        useSsl = parts.scheme == "https"
+        self.host = parts.netloc
+        self.apiPath = parts.path.rstrip("/") + API_PATH
+        self.pool = ConnectionPool(parts.hostname, parts.port or (443 if useSsl else 80), useSsl, concurrency)
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.requests = 0
+
+    async def _get(self, target):
+        connection = await self.pool.acquire()
+        try:
+            self.requests += 1
+            return await asyncio.wait_for(connection.get(self.host, target), self.timeout)
+        except BaseException:
+            connection.reusable = False
+            raise
+        finally:
+            self.pool.release(connection)
+
+    async def api(self, **params):
+        """One api.php query; returns the decoded JSON."""
+        params.update(format="json", formatversion=2)
+        target = self.apiPath + "?" + urlencode(params)
+        for attempt in range(self.retries + 1):
+            await self.limiter.wait()
+            delay = self.backoff * 2 ** attempt
+            try:
+                status, headers, body = await self._get(target)
+            except (OSError, EOFError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            if status == 200:
+                return json.loads(body)
+            if (status != 429 and status < 500) or attempt == self.retries:
+                raise HTTPError(status, target)
+            if headers.get("retry-after", "").isdigit():
+                delay = max(delay, int(headers["retry-after"]))
+            await asyncio.sleep(delay)
+
+    async def categoryMembers(self, category):
+        """(page id, title) of every article in ``category``."""
+        params = {"action": "query", "list": "categorymembers", "cmtitle": category,
+                  "cmnamespace": 0, "cmlimit": 500}
+        members = []
+        while True:
+            data = await self.api(**params)
+            members += [(m["pageid"], m["title"]) for m in data["query"]["categorymembers"]]
+            if "continue" not in data:
+                return members
+            params.update(data["continue"])
+
+    async def _query(self, titles, **params):
+        data = await self.api(action="query", titles="|".join(titles), **params)
+        # the API answers under its normalized spelling of each title
+        asked = {n["to"]: n["from"] for n in data["query"].get("normalized", [])}
+        return {asked.get(page["title"], page["title"]): page for page in data["query"]["pages"]}
+
+    async def wikitext(self, titles):
+        """Current wikitext of each of ``titles`` (up to ``BATCH``); missing pages are left out."""
+        pages = await self._query(titles, prop="revisions", rvprop="content", rvslots="main")
+        return {title: page["revisions"][0]["slots"]["main"]["content"]
+                for title, page in pages.items() if page.get("revisions")}
+
+    async def appearances(self, titles):
+        """Size of each title's "<title>/Appearances" category (None if there isn't one)."""
+        categories = ["Category:%s/Appearances" % title for title in titles]
+        pages = await self._query(categories, prop="categoryinfo")
+        return {title: pages.get(category, {}).get("categoryinfo", {}).get("pages")
+                for title, category in zip(titles, categories)}
+
+    def close(self):
+        self.pool.close()
+
+
+def _plainText(value):
+    value = _NOISE.sub("", _LINK.sub(r"\1", value))
+    return " ".join(value.split())
+
+
+def parseInfobox(wikitext):
+    """The ``| Key = Value`` parameters of a page's infobox, as plain text."""
+    return {key: _plainText(value) for key, value in _PARAM.findall(wikitext)}
+
+
+def label(column, value):
+    """dc-comics.csv label for an infobox value, e.g. ("ALIGN", "Good") -> "Good Characters"."""
+    if not value:
+        return None
+    labels = LABELS.get(column, {})
+    if value in labels:
+        return labels[value]
+    suffix = SUFFIXES.get(column, "")
+    if value.endswith(suffix) or value in labels.values():
+        return value
+    return value + suffix
+
+
+def characterRow(pageId, title, wikitext, appearances):
+    """One dc-comics.csv row from a character page and its appearance count."""
+    row = dict.fromkeys(COLUMNS)
+    row.update(page_id=pageId, name=title, urlslug="\\/wiki\\/" + title.replace(" ", "_"),
+               APPEARANCES=appearances)
+    for key, value in parseInfobox(wikitext).items():
+        if key in FIELDS:
+            row[FIELDS[key]] = label(FIELDS[key], value)
+    year = _YEAR.search(row["FIRST APPEARANCE"] or "")
+    row["YEAR"] = int(year.group(1)) if year else None
+    return row
+
+
+def readCheckpoint(path):
+    """Rows already scraped, by title; a half-written last line is ignored."""
+    rows = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                rows[row["name"]] = row
+    return rows
+
+
+async def scrape(baseUrl, categories=("Category:Characters",), out=None, checkpoint=None,
+                 concurrency=8, rate=10, retries=4):
+    """Scrape every character in ``categories``; returns a frame in the dc-comics.csv layout.
+
+    With ``out`` the frame is also written there as CSV.  With ``checkpoint``
+    finished rows are appended to that file as they arrive, and characters
+    already in it are not fetched again.
+    """
+    client = WikiClient(baseUrl, concurrency, rate, retries)
+    done = readCheckpoint(checkpoint)
+    try:
+        members = {}
+        for category in categories:
+            members.update((title, pageId) for pageId, title in await client.categoryMembers(category))
+        todo = [title for title in members if title not in done]
+        log = open(checkpoint, "a") if checkpoint else None
+
+        async def fetch(batch):
+            texts, counts = await asyncio.gather(client.wikitext(batch), client.appearances(batch))
+            rows = [characterRow(members[title], title, texts.get(title, ""), counts[title]) for title in batch]
+            if log:
+                log.write("".join(json.dumps(row) + "\n" for row in rows))
+                log.flush()
+            done.update((row["name"], row) for row in rows)
+
+        try:
+            await asyncio.gather(*(fetch(todo[i:i + BATCH]) for i in range(0, len(todo), BATCH)))
+        finally:
+            if log:
+                log.close()
+    finally:
+        client.close()
+
+    characters = pd.DataFrame([done[title] for title in members if title in done], columns=COLUMNS)
+    characters = characters.sort_values("APPEARANCES", ascending=False, kind="stable", ignore_index=True)
+    if out:
+        characters.to_csv(out, index=False)
+    return characters
+
+
+def _infoboxValue(column, value):
+    # inverse of label(), for rendering stub pages
+    for short, full in LABELS.get(column, {}).items():
+        if full == value:
+            return short
+    suffix = SUFFIXES.get(column, "")
+    return value[:-len(suffix)] if suffix and value.endswith(suffix) else value
+
+
+class StubWiki:
+    """A local stand-in for the wiki's api.php, serving canned characters.
+
+    ``characters`` is a frame in the dc-comics.csv layout; every row becomes
+    a page in ``category`` with an infobox and an "/Appearances" category.
+    Every ``failEvery``-th request is answered with a 503 to exercise the
+    retries, and ``chunked`` sends bodies with chunked transfer encoding.
+
+        async with StubWiki(characters) as url:
+            rescraped = await scrape(url)
+    """
+
+    def __init__(self, characters, category="Category:Characters", failEvery=None, chunked=False):
+        self.category = category
+        self.failEvery = failEvery
+        self.chunked = chunked
+        self.requests = 0
+        self.connections = 0
+        self._writers = set()
+        self._handlers = set()
+        self._members = []
+        self._pages = {}
+        self._appearances = {}
+        for row in characters.to_dict("records"):
+            title = row["name"]
+            lines = ["{{DC Database:Character Template", "| Name = %s" % title]
+            for key, column in FIELDS.items():
+                value = row.get(column)
+                if isinstance(value, str) and value:
+                    lines.append("| %s = %s" % (key, _infoboxValue(column, value)))
+            self._pages[title] = "\n".join(lines + ["}}", "", "[[Category:Characters]]"])
+            self._members.append({"pageid": int(row["page_id"]), "ns": 0, "title": title})
+            if pd.notnull(row.get("APPEARANCES")):
+                self._appearances["Category:%s/Appearances" % title] = int(row["APPEARANCES"])
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return "http://127.0.0.1:%d" % self._server.sockets[0].getsockname()[1]
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def _answer(self, params):
+        if params.get("list") == "categorymembers":
+            if params.get("cmtitle") != self.category:
+                return {"query": {"categorymembers": []}}
+            start, limit = int(params.get("cmcontinue", 0)), int(params.get("cmlimit", 10))
+            data = {"query": {"categorymembers": self._members[start:start + limit]}}
+            if start + limit < len(self._members):
+                data["continue"] = {"cmcontinue": str(start + limit), "continue": "-||"}
+            return data
+        pages = []
+        for title in params.get("titles", "").split("|"):
+            if params.get("prop") == "revisions" and title in self._pages:
+                pages.append({"title": title, "revisions": [{"slots": {"main": {"content": self._pages[title]}}}]})
+            elif params.get("prop") == "categoryinfo" and title in self._appearances:
+                pages.append({"title": title, "categoryinfo": {"pages": self._appearances[title]}})
+            else:
+                pages.append({"title": title, "missing": True})
+        return {"query": {"pages": pages}}
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    return
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                self.requests += 1
+                target = requestLine.decode("latin-1").split(" ")[1]
+                if self.failEvery and self.requests % self.failEvery == 0:
+                    status, body = "503 Service Unavailable", b"{}"
+                else:
+                    status, body = "200 OK", json.dumps(self._answer(dict(parse_qsl(urlsplit(target).query)))).encode()
+                if self.chunked:
+                    chunks = b"".join(b"%x\r\n%s\r\n" % (len(body[i:i + 4096]), body[i:i + 4096])
+                                      for i in range(0, len(body), 4096))
+                    writer.write(b"HTTP/1.1 %s\r\nContent-Type: application/json\r\n"
+                                 b"Transfer-Encoding: chunked\r\n\r\n%s0\r\n\r\n" % (status.encode(), chunks))
+                else:
+                    writer.write(b"HTTP/1.1 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (status.encode(), len(body), body))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def _scrapeStub(path, **options):
+    async with StubWiki(pd.read_csv(path), failEvery=options.pop("failEvery")) as url:
+        return await scrape(url, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("wiki", nargs="?", default="https://dc.fandom.com", help="base URL of the wiki")
+    parser.add_argument("--category", action="append", dest="categories",
+                        help="category to scrape (repeatable; default Category:Characters)")
+    parser.add_argument("--out", default="dc-comics-rescrape.csv", help="CSV to write, in the dc-comics.csv layout")
+    parser.add_argument("--checkpoint", metavar="JSONL", help="resume from / append progress to this file")
+    parser.add_argument("--concurrency", type=int, default=8, help="connections (and requests) in flight")
+    parser.add_argument("--rate", type=float, default=10, help="requests per second at most (0: no limit)")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--stub", metavar="CSV", help="scrape a local stub wiki serving this CSV instead")
+    parser.add_argument("--fail-every", type=int, help="with --stub, answer every Nth request with a 503")
+    args = parser.parse_args(argv)
+
+    options = dict(categories=args.categories or ["Category:Characters"], out=args.out,
+                   checkpoint=args.checkpoint, concurrency=args.concurrency, rate=args.rate, retries=args.retries)
+    start = time.perf_counter()
+    if args.stub:
+        characters = asyncio.run(_scrapeStub(args.stub, failEvery=args.fail_every, **options))
+    else:
+        characters = asyncio.run(scrape(args.wiki, **options))
+    print("%d characters in %.1fs -> %s" % (len(characters), time.perf_counter() - start, args.out))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
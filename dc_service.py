@@ -0,0 +1,241 @@
+"""Long-running query service over a warm, in-memory representation index.
+
+Answering "representation among living villains who debuted after 1990"
+used to mean editing the script and rerunning it from the CSV.  The service
+loads the cleaned frame once, builds a GENDER x strata x YEAR cube and a
+``RankIndex`` of every GENDER x strata group, and then answers queries over
+HTTP from those:
+
+    python dc_service.py dc-comics.csv --port 8765
+
+    GET /contingency?ALIVE=Living+Characters&ALIGN=Bad+Characters&yearFrom=1991
+    GET /contingency?by=ALIGN&by=ALIVE
+    GET /topk?GENDER=Female+Characters&ALIVE=Living+Characters&k=5
+    GET /strata
+
+Any GENDER or stratum column can be filtered on (repeat a parameter to
+allow several values), ``yearFrom`` / ``yearTo`` bound the first-appearance
+YEAR (inclusive), ``by`` splits a contingency table into strata, and ``k``
+sets how many characters /topk returns.  Answers are JSON records.
+
+A contingency query only touches the cube's few thousand cells and a top-k
+query merges the presorted lists of the groups it selects, never scanning
+the whole frame.  Every
+answer is also kept, already encoded, in an LRU cache keyed on the
+normalized query, so repeated dashboard queries cost a dictionary lookup.
+"""
+
+import argparse
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from dc_chisquare import BASELINE, getChiSquare
+from dc_memo import CachedAnalysis
+from dc_ranking import RankIndex
+from dc_stratify import addStrata, getCube, rollUp, strataLevels
+
+TOPK_COLUMNS = ["name", "GENDER", "ALIGN", "ALIVE", "APPEARANCES", "YEAR"]
+
+
+class RepresentationIndex:
+    """Cleaned characters plus the cube and group indexes that queries are answered from.
+
+    ``where`` arguments map GENDER or a stratum column to one label or a
+    list of labels; ``yearFrom`` / ``yearTo`` are inclusive bounds on YEAR
+    (characters without a YEAR drop out once either is given).
+    """
+
+    def __init__(self, dc, strata=("ALIGN", "ALIVE"), baseline=BASELINE):
+        self.strata = list(strata)
+        # derived strata (DECADE, UNIVERSE) become columns the ranking can group on
+        self.dc = addStrata(dc.reset_index(drop=True), self.strata)
+        self.baseline = baseline
+        self.columns = ["GENDER"] + self.strata
+        self.cube = getCube(self.dc, self.strata + ["YEAR"])
+        self._cubeYears = self.cube.index.get_level_values("YEAR").to_numpy(dtype=float, na_value=np.nan)
+        # every GENDER x strata group's rows, sorted by appearances, for top-k queries
+        self.ranking = RankIndex(self.dc, self.columns)
+        self._years = self.dc.YEAR.to_numpy(dtype=float, na_value=np.nan)
+        # each column's labels by their text, since queries arrive as text
+        # ("DECADE=1990" has to find the number 1990)
+        self._labels = {c: {str(v): v for v in pd.unique(self.dc[c].dropna())} for c in self.columns}
+
+    def _checkColumns(self, where, by=()):
+        unknown = [c for c in list(where) + list(by) if c not in self.columns]
+        if unknown:
+            raise ValueError("can't filter or split on %s (choose from %s)"
+                             % (", ".join(unknown), ", ".join(self.columns)))
+        if "GENDER" in by:
+            raise ValueError("can't split on GENDER: every table already has one column per gender")
+
+    def _where(self, where, by=()):
+        where = where or {}
+        self._checkColumns(where, by)
+        known = {}
+        for column, labels in where.items():
+            labels = labels if pd.api.types.is_list_like(labels) else [labels]
+            known[column] = [self._labels[column].get(str(label), label) for label in labels]
+        return known
+
+    @staticmethod
+    def _inRange(years, yearFrom, yearTo):
+        keep = np.ones(len(years), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if yearFrom is not None:
+                keep &= years >= yearFrom
+            if yearTo is not None:
+                keep &= years <= yearTo
+        return keep
+
+    def contingency(self, where=None, yearFrom=None, yearTo=None, by=()):
+        """Contingency table and chi-square test for the selected characters, split ``by`` strata."""
+        where = self._where(where, by)
+        cube = self.cube
+        if yearFrom is not None or yearTo is not None:
+            cube = cube[self._inRange(self._cubeYears, yearFrom, yearTo)]
+        table = rollUp(cube, by, where=where)
+        return getChiSquare(table[table.sum(axis=1) > 0], self.baseline)
+
+    def topK(self, where=None, yearFrom=None, yearTo=None, k=5):
+        """The ``k`` selected characters with the most appearances, most first."""
+        top = self.ranking.top(k, yearFrom, yearTo, **self._where(where))
+        return top[[c for c in dict.fromkeys(TOPK_COLUMNS + self.strata) if c in top.columns]]
+
+    def describe(self):
+        """Filterable columns with their labels, and the YEAR range."""
+        values = {c: list(labels) for c, labels in self._labels.items()}
+        return {"columns": values, "years": [np.nanmin(self._years), np.nanmax(self._years)],
+                "characters": len(self.dc)}
+
+
+def _toJson(frame):
+    return frame.reset_index().to_json(orient="records").encode()
+
+
+class QueryService:
+    """Parses HTTP queries, answers them from a ``RepresentationIndex`` and caches the answers."""
+
+    def __init__(self, index, cacheSize=4096):
+        self.index = index
+        self.cacheSize = cacheSize
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _parse(self, params):
+        params = {name: list(values) for name, values in params.items()}
+        options = {}
+        for name in ("yearFrom", "yearTo"):
+            if name in params:
+                options[name] = int(params.pop(name)[-1])
+        by = params.pop("by", [])
+        k = int(params.pop("k", ["5"])[-1])
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        where = {name: sorted(values) for name, values in sorted(params.items())}
+        return where, options, by, k
+
+    def _compute(self, path, where, options, by, k):
+        if path == "/contingency":
+            return _toJson(self.index.contingency(where, by=by, **options))
+        if path == "/topk":
+            return _toJson(self.index.topK(where, k=k, **options).rename_axis("row"))
+        if path == "/strata":
+            return json.dumps(self.index.describe()).encode()
+        raise KeyError(path)
+
+    def answer(self, path, params):
+        """JSON bytes answering ``path`` with query ``params`` (as from ``parse_qs``).
+
+        Raises KeyError for an unknown path and ValueError for a bad query.
+        """
+        where, options, by, k = self._parse(params)
+        key = (path, tuple((c, tuple(v)) for c, v in where.items()), tuple(sorted(options.items())),
+               tuple(by), k)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+        body = self._compute(path, where, options, by, k)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = body
+            while len(self._cache) > self.cacheSize:
+                self._cache.popitem(last=False)
+        return body
+
+    def warm(self):
+        """Answer the unfiltered contingency query for every stratification level up front."""
+        for by in strataLevels(self.index.strata):
+            self.answer("/contingency", {"by": list(by)} if by else {})
+
+    def serve(self, host="127.0.0.1", port=8765):
+        """An HTTP server for this service (call ``serve_forever`` on it)."""
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.service = self
+        server.verbose = False
+        server.daemon_threads = True
+        return server
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, so a dashboard's queries don't each pay for a new connection;
+    # headers and body go out as separate writes, so Nagle would add ~40ms
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, body = 200, self.server.service.answer(url.path, parse_qs(url.query))
+        except KeyError:
+            status, body = 404, json.dumps({"error": "no such endpoint: %s" % url.path}).encode()
+        except ValueError as error:
+            status, body = 400, json.dumps({"error": str(error)}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("input", nargs="?", default="dc-comics.csv", help="wiki-scrape CSV")
+    parser.add_argument("--strata", nargs="*", default=["ALIGN", "ALIVE"], help="columns queries can filter on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-size", type=int, default=4096, help="answers kept in the LRU cache")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    # the cleaned frame comes from the results cache when the CSV hasn't changed
+    dc = CachedAnalysis(args.input, args.strata).characters()
+    service = QueryService(RepresentationIndex(dc, args.strata), args.cache_size)
+    service.warm()
+    server = service.serve(args.host, args.port)
+    server.verbose = args.verbose
+    print("serving %d characters on http://%s:%d" % (len(dc), args.host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Stratification cube for the DC representation analysis.
+
+Instead of filtering ``dc`` into a separate DataFrame for every stratum
+(good, evil, alive, dead, good & alive, ...) and running a groupby on each
+copy, the frame is aggregated once into a GENDER x strata cube.  Every
+single-level or multi-level stratum is then a cheap roll-up of that cube.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from dc_names import splitNames
+from dc_trace import stage
+
+GENDERS = ["Female Characters", "Male Characters", "Nonbinary Characters"]
+
+
+# strata that aren't columns in the scrape, and the column each is derived from
+DERIVED = {"DECADE": "YEAR", "UNIVERSE": "name"}
+
+
+def sourceColumns(strata):
+    """The scrape columns needed to build ``strata``."""
+    return list(dict.fromkeys(DERIVED.get(s, s) for s in strata))
+
+
+def _stratum(dc, name):
+    if name in dc.columns:
+        return dc[name]
+    if name == "DECADE":
+        return (dc.YEAR // 10 * 10).rename("DECADE")
+    if name == "UNIVERSE":
+        # the incremental state keeps names as its index
+        names = dc["name"] if "name" in dc.columns else dc.index.to_series()
+        return splitNames(names).universe.rename("UNIVERSE")
+    return dc[name]
+
+
+def addStrata(dc, strata):
+    """``dc`` plus a column for each derived stratum (DECADE, UNIVERSE) in ``strata``."""
+    missing = [name for name in strata if name in DERIVED and name not in dc.columns]
+    return dc.assign(**{name: _stratum(dc, name) for name in missing}) if missing else dc
+
+
+def getCube(dc, strata=("ALIGN", "ALIVE")):
+    """Sum APPEARANCES and count characters per GENDER x strata cell in one pass.
+
+    ``strata`` can be any list of columns (ALIGN, ALIVE, EYE, HAIR, ID, ...)
+    plus "DECADE", derived from YEAR, and "UNIVERSE", the "(New Earth)" part
+    of the name.  Missing stratum values are kept as their own cell so the
+    overall totals still match the full frame.
+    """
+    with stage("stratify", rowsIn=len(dc), strata=list(strata)) as s:
+        keys = [dc.GENDER] + [_stratum(dc, name) for name in strata]
+        cube = dc.groupby(keys, dropna=False, observed=True).APPEARANCES.agg(["sum", "size"])
+        cube.columns = ["APPEARANCES", "CHARACTERS"]
+        # nullable int / categorical inputs shouldn't change the cube's dtypes
+        cube = cube.astype({"APPEARANCES": "float64", "CHARACTERS": "int64"})
+        s.rowsOut = len(cube)
+    return cube
+
+
+def mergeCubes(cubes):
+    """Add several cubes together cell by cell (missing cells count as zero)."""
+    merged = pd.concat(cubes)
+    return merged.groupby(level=list(range(merged.index.nlevels)), dropna=False).sum()
+
+
+def rollUp(cube, by=(), where=None, value="APPEARANCES"):
+    """Roll the cube up to a (strata x gender) table.
+
+    ``by`` lists the stratum levels to keep as rows (an empty list gives the
+    overall totals as a single "All" row).  ``where`` optionally restricts the
+    cube first, e.g. ``{"ALIGN": "Good Characters"}``.  ``value`` picks either
+    the "APPEARANCES" sums or the "CHARACTERS" counts.
+    """
+    cells = cube[value]
+    if where:
+        mask = np.ones(len(cells), dtype=bool)
+        for level, wanted in where.items():
+            if not pd.api.types.is_list_like(wanted):
+                wanted = [wanted]
+            mask &= cells.index.get_level_values(level).isin(wanted)
+        cells = cells[mask]
+
+    by = list(by)
+    if by:
+        table = cells.groupby(level=["GENDER"] + by, dropna=False, observed=True).sum()
+        table = table.unstack("GENDER")
+    else:
+        table = cells.groupby(level="GENDER", observed=True).sum().to_frame("All").T
+    table = table.reindex(columns=GENDERS, fill_value=0).fillna(0)
+    table.columns.name = "GENDER"
+    return table
+
+
+def stratumLabel(key, levels=()):
+    """Readable label for a stratum key, e.g. "Good Characters / Living Characters".
+
+    Missing values are labelled by their column ("Unknown ALIGN") so strata
+    from different levels never share a label.
+    """
+    if not isinstance(key, tuple):
+        key = (key,)
+    levels = list(levels) + [None] * (len(key) - len(levels))
+    parts = []
+    for k, level in zip(key, levels):
+        if pd.isna(k):
+            parts.append("Unknown %s" % level if level else "Unknown")
+        else:
+            parts.append(str(k))
+    return " / ".join(parts)
+
+
+def strataLevels(strata):
+    """Every combination of the stratifying columns, from overall up to all of them."""
+    return [combo for r in range(len(strata) + 1) for combo in itertools.combinations(strata, r)]
+
+
+def allStrata(cube, levels=((), ("ALIGN",), ("ALIVE",), ("ALIGN", "ALIVE")), value="APPEARANCES"):
+    """Stack the roll-ups for several stratifications into one (strata x gender) table.
+
+    Rows are labelled "All", "Good Characters", "Good Characters / Living
+    Characters" and so on, which is the shape the chi-square engine expects.
+    """
+    tables = []
+    for by in levels:
+        table = rollUp(cube, by, value=value)
+        table.index = [stratumLabel(key, by) for key in table.index]
+        tables.append(table)
+    strata = pd.concat(tables)
+    strata.index.name = "Stratum"
+    return strata
+
+
+def stratumCharacters(dc, levels=((),)):
+    """Yield (label, gender codes, appearances) for each stratum's characters.
+
+    Strata and labels match ``allStrata``; gender codes index ``GENDERS`` and
+    characters with any other gender are left out.  This is what the
+    character-level resampling methods (permutation, bootstrap) work on.
+    """
+    codes = pd.Categorical(dc.GENDER, categories=GENDERS).codes
+    keep = codes >= 0
+    codes = codes[keep]
+    appearances = np.nan_to_num(dc.APPEARANCES.to_numpy(dtype=float)[keep])
+    for by in levels:
+        if by:
+            kept = dc[keep]
+            # missing labels are strata of their own ("Unknown ALIGN"), as in
+            # allStrata; GroupBy.indices would drop them for a single column
+            grouped = kept.groupby([_stratum(kept, name) for name in by], observed=True, dropna=False)
+            ids = grouped.ngroup().to_numpy()
+            bounds = np.cumsum(np.bincount(ids, minlength=grouped.ngroups))[:-1]
+            groups = zip(grouped.size().index, np.split(np.argsort(ids, kind="stable"), bounds))
+        else:
+            groups = [("All", np.arange(len(codes)))]
+        for key, positions in groups:
+            yield stratumLabel(key, by), codes[positions], appearances[positions]
@@ -0,0 +1,36 @@
+"""Chunked, bounded-memory aggregation for scrapes that don't fit in RAM.
+
+Everything downstream of cleaning only needs per-cell appearance sums and
+character counts, so the CSV is read a chunk at a time, each chunk is cleaned
+and reduced to a small cube, and the cubes are merged as they arrive.  Memory
+stays flat at roughly one chunk plus one cube, and the merged cube is the same
+one ``getCube`` builds from the whole cleaned frame.
+"""
+
+import pandas as pd
+
+from dc_clean import cleanFrame, DROPPED_ROWS
+from dc_loader import SCHEMA
+from dc_stratify import getCube, mergeCubes, sourceColumns
+
+
+def streamCube(path="dc-comics.csv", strata=("ALIGN", "ALIVE"), chunksize=1_000_000,
+               dropRows=DROPPED_ROWS, rules=None):
+    """Build the GENDER x strata cube for ``path`` without loading it whole.
+
+    The result can go straight into ``rollUp`` / ``allStrata`` and
+    ``getChiSquare``, exactly like a cube from the in-memory path.  ``rules``
+    is passed through to ``cleanFrame``.
+    """
+    columns = {"name", "SEX", "APPEARANCES"}
+    columns.update(sourceColumns(strata))
+
+    cube = None
+    dtypes = {c: SCHEMA.get(c, "category") for c in columns}
+    reader = pd.read_csv(path, usecols=lambda c: c in columns, dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        # chunks keep the file's row numbers as their index, so dropRows
+        # removes the same rows as it does on the full frame
+        chunkCube = getCube(cleanFrame(chunk, dropRows, rules), strata)
+        cube = chunkCube if cube is None else mergeCubes([cube, chunkCube])
+    return cube
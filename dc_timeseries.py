@@ -0,0 +1,81 @@
+"""Representation over time, by YEAR of first appearance.
+
+Characters are binned by first-appearance year (or decade, etc.) and summed
+per gender in a single pass.  Every rolling or expanding window of bins is
+then a difference of two prefix sums, so all windows of every size go through
+the vectorized chi-square engine together instead of one filter + groupby per
+window.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dc_chisquare import BASELINE, getChiSquare
+from dc_stratify import GENDERS
+
+
+def yearlyTotals(dc, binWidth=1, value="APPEARANCES"):
+    """(year bin x gender) appearance sums, with empty bins filled in as zero.
+
+    ``binWidth=10`` gives decades.  ``value="CHARACTERS"`` counts characters
+    instead of summing appearances.  Characters with no YEAR are left out.
+    """
+    dated = dc.YEAR.notnull() & dc.GENDER.isin(GENDERS)
+    years = (dc.YEAR[dated] // binWidth * binWidth).astype(int).to_numpy()
+    genders = pd.Categorical(dc.GENDER[dated], categories=GENDERS).codes
+    weights = None if value == "CHARACTERS" else np.nan_to_num(dc.APPEARANCES[dated].to_numpy(dtype=float))
+
+    if len(years) == 0:
+        return pd.DataFrame(columns=GENDERS, dtype=float)
+    first = years.min()
+    rows = (years - first) // binWidth
+    nBins = rows.max() + 1
+    totals = np.bincount(rows * len(GENDERS) + genders, weights=weights,
+                         minlength=nBins * len(GENDERS)).reshape(nBins, len(GENDERS))
+    index = pd.Index(first + binWidth * np.arange(nBins), name="YEAR")
+    return pd.DataFrame(totals, index=index, columns=GENDERS)
+
+
+def cumulativeTotals(yearly):
+    """Running totals per gender up to and including each bin."""
+    return yearly.cumsum()
+
+
+def windowSums(yearly, window=None):
+    """Per-gender sums over every window of ``window`` consecutive bins.
+
+    With ``window=None`` the windows are expanding (first bin up to each
+    bin).  Each window is labelled "first-last" by the bins it covers.
+    """
+    prefix = np.vstack([np.zeros((1, yearly.shape[1])), yearly.cumsum().to_numpy()])
+    bins = yearly.index.to_numpy()
+    if window is None:
+        sums, starts, ends = prefix[1:], np.zeros(len(bins), dtype=int), np.arange(len(bins))
+    else:
+        sums = prefix[window:] - prefix[:-window]
+        starts = np.arange(len(sums))
+        ends = starts + window - 1
+    labels = ["%d-%d" % (bins[s], bins[e]) for s, e in zip(starts, ends)]
+    return pd.DataFrame(sums, index=pd.Index(labels, name="Years"), columns=yearly.columns)
+
+
+def windowTests(dc, windows=(None, 5, 10), binWidth=1, baseline=BASELINE):
+    """Contingency table and chi-square test for every year window.
+
+    ``windows`` lists rolling window sizes in bins; ``None`` means expanding.
+    Returns one tidy table indexed by (Window, Years, Gender).
+    """
+    yearly = yearlyTotals(dc, binWidth)
+    observed = pd.concat({
+        "expanding" if w is None else "rolling %d" % w: windowSums(yearly, w)
+        for w in windows if w is None or w <= len(yearly)
+    }, names=["Window"])
+    # windows without any appearances have nothing to test
+    observed = observed[observed.sum(axis=1) > 0]
+    flat = observed.set_axis(pd.RangeIndex(len(observed), name="Stratum"))
+    tests = getChiSquare(flat, baseline)
+    tests.index = pd.MultiIndex.from_arrays(
+        [np.repeat(observed.index.get_level_values(level), len(observed.columns))
+         for level in ("Window", "Years")] + [tests.index.get_level_values("Gender")],
+        names=["Window", "Years", "Gender"])
+    return tests
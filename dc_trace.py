@@ -0,0 +1,154 @@
+"""Per-stage timing and memory instrumentation.
+
+Library code marks its stages with ``stage``:
+
+    with stage("recode", rowsIn=len(dc)) as s:
+        dc = recodeGender(dc)
+        s.rowsOut = len(dc)
+
+Nothing is recorded until a ``Tracer`` is installed with ``setTracer``; until
+then ``stage`` hands back one shared do-nothing object, so leaving the calls
+in production code costs next to nothing.  An enabled tracer records wall
+time, CPU time, rows in/out and (optionally, via tracemalloc) peak memory
+allocated during the stage, and writes them as a JSON trace or in Chrome's
+trace-event format (chrome://tracing, Perfetto).
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class _NullStage:
+    """Stand-in for a stage record when tracing is off; ignores everything."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, tracer, name, rowsIn, args):
+        self.tracer = tracer
+        self.name = name
+        self.rowsIn = rowsIn
+        self.rowsOut = None
+        self.args = args
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._exit(self)
+        return False
+
+
+class Tracer:
+    """Collects one record per stage; see the module docstring."""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.records = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._startedTracemalloc = False
+
+    def stage(self, name, rowsIn=None, **args):
+        return _Stage(self, name, rowsIn, args)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _enter(self, stage):
+        stack = self._stack()
+        stage.depth = len(stack)
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._startedTracemalloc = True
+            current, peak = tracemalloc.get_traced_memory()
+            # the parent's peak so far would be lost by the reset below
+            if stack:
+                stack[-1].peakSeen = max(stack[-1].peakSeen, peak)
+            tracemalloc.reset_peak()
+            stage.memStart, stage.peakSeen = current, current
+        stack.append(stage)
+        stage.start = time.perf_counter()
+        stage.cpuStart = time.process_time()
+
+    def _exit(self, stage):
+        wall = time.perf_counter() - stage.start
+        cpu = time.process_time() - stage.cpuStart
+        stack = self._stack()
+        stack.pop()
+        peakMB = None
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(stage.peakSeen, peak)
+            peakMB = (peak - stage.memStart) / 2**20
+            if stack:
+                stack[-1].peakSeen = max(stack[-1].peakSeen, peak)
+        self.add(stage.name, wall, cpu, stage.rowsIn, stage.rowsOut, peakMB,
+                 start=stage.start - self._origin, depth=stage.depth, **stage.args)
+
+    def add(self, name, wall, cpu=None, rowsIn=None, rowsOut=None, peakMB=None, start=None,
+            depth=0, **args):
+        """Record a stage measured elsewhere (e.g. in a worker process)."""
+        if start is None:
+            start = time.perf_counter() - self._origin - wall
+        self.records.append({
+            "name": name, "start_s": start, "wall_s": wall, "cpu_s": cpu,
+            "rows_in": rowsIn, "rows_out": rowsOut, "peak_mb": peakMB, "depth": depth,
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+        })
+
+    def close(self):
+        if self._startedTracemalloc:
+            tracemalloc.stop()
+            self._startedTracemalloc = False
+
+    def toJson(self, path):
+        with open(path, "w") as f:
+            json.dump(self.records, f, indent=1, default=str)
+
+    def toChromeTrace(self, path):
+        events = [{
+            "name": r["name"], "ph": "X", "pid": r["pid"], "tid": r["tid"],
+            "ts": r["start_s"] * 1e6, "dur": r["wall_s"] * 1e6,
+            "args": {k: v for k, v in r.items() if k not in ("name", "pid", "tid", "start_s", "wall_s")},
+        } for r in self.records]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+_tracer = None
+
+
+def setTracer(tracer):
+    """Install ``tracer`` for every ``stage`` call (None turns tracing off)."""
+    global _tracer
+    _tracer = tracer
+
+
+def getTracer():
+    return _tracer
+
+
+def stage(name, rowsIn=None, **args):
+    """Context manager marking one stage; a no-op unless a tracer is installed."""
+    if _tracer is None:
+        return _NULL_STAGE
+    return _tracer.stage(name, rowsIn, **args)